@@ -0,0 +1,169 @@
+import gzip
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from metrics import stage
+
+BUCKET_NAME = "a-sample-bajaj-bucket"
+
+# Gzip archived files (keys get a .gz suffix)
+ARCHIVE_GZIP = os.environ.get("ARCHIVE_GZIP", "0") == "1"
+# Archive to this local directory instead of S3
+ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR")
+ARCHIVE_MAX_ATTEMPTS = int(os.environ.get("ARCHIVE_MAX_ATTEMPTS", 5))
+# Delay before the first retry; doubled on every further failure
+ARCHIVE_RETRY_SECONDS = float(os.environ.get("ARCHIVE_RETRY_SECONDS", 5))
+
+logger = logging.getLogger(__name__)
+
+# Multipart upload in parts of this size, streamed from disk
+MULTIPART_CHUNK_BYTES = 16 * 1024 * 1024
+
+
+class S3Sink:
+    def __init__(self, s3_client, bucket=BUCKET_NAME):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self._transfer_config = None
+
+    def put(self, path, key, content_type, content_encoding=None):
+        extra_args = {"ContentType": content_type}
+        if content_encoding:
+            extra_args["ContentEncoding"] = content_encoding
+        if self._transfer_config is None:
+            from boto3.s3.transfer import TransferConfig
+            self._transfer_config = TransferConfig(multipart_threshold=MULTIPART_CHUNK_BYTES,
+                                                   multipart_chunksize=MULTIPART_CHUNK_BYTES)
+        self.s3_client.upload_file(path, self.bucket, key, ExtraArgs=extra_args, Config=self._transfer_config)
+
+    def __repr__(self):
+        return f"s3://{self.bucket}"
+
+
+class LocalSink:
+    """
+        Archive into a local directory, keeping the S3 key layout.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def put(self, path, key, content_type, content_encoding=None):
+        target = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(path, target)
+
+    def __repr__(self):
+        return self.root
+
+
+def default_sink(s3_client):
+    """
+        Local directory if ARCHIVE_DIR is set, S3 otherwise.
+    """
+    if ARCHIVE_DIR:
+        return LocalSink(ARCHIVE_DIR)
+    return S3Sink(s3_client)
+
+
+class ArchiveTask:
+    def __init__(self, path, key, content_type, delete_after):
+        self.path = path
+        self.key = key
+        self.content_type = content_type
+        self.delete_after = delete_after
+        self.attempts = 0
+        self.retry_at = 0.0
+
+
+class Archiver:
+    """
+        Uploads input and result files in a background thread so requests do
+        not wait on S3. Failed uploads go to a retry queue with exponential
+        backoff; after ARCHIVE_MAX_ATTEMPTS the file is left on disk and
+        reported in `failed`.
+    """
+
+    def __init__(self, sink, compress=ARCHIVE_GZIP, max_attempts=ARCHIVE_MAX_ATTEMPTS,
+                 retry_seconds=ARCHIVE_RETRY_SECONDS):
+        self.sink = sink
+        self.compress = compress
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.failed = []
+        self._queue = queue.Queue()
+        self._retries = []
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="archiver", daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self):
+        return self._queue.qsize() + len(self._retries)
+
+    def archive_key(self, key):
+        return f"{key}.gz" if self.compress else key
+
+    def archive(self, path, key, content_type="text/csv", delete_after=True):
+        """
+            Queue `path` for upload under `key` and return the final key.
+            With delete_after the file is removed once it is archived.
+        """
+        self._queue.put(ArchiveTask(path, key, content_type, delete_after))
+        return self.archive_key(key)
+
+    def _upload(self, task):
+        if not self.compress:
+            with stage("archive_upload", nbytes=os.path.getsize(task.path)):
+                self.sink.put(task.path, task.key, task.content_type)
+            return
+
+        with tempfile.NamedTemporaryFile(suffix=".gz", delete=False) as compressed:
+            with open(task.path, "rb") as source, gzip.GzipFile(fileobj=compressed, mode="wb") as gz:
+                shutil.copyfileobj(source, gz, 1024 * 1024)
+        try:
+            with stage("archive_upload", nbytes=os.path.getsize(compressed.name)):
+                self.sink.put(compressed.name, self.archive_key(task.key), task.content_type, content_encoding="gzip")
+        finally:
+            os.remove(compressed.name)
+
+    def _process(self, task):
+        task.attempts += 1
+        try:
+            self._upload(task)
+        except Exception as e:
+            if task.attempts >= self.max_attempts:
+                logger.error("Archiving %s failed after %d attempts, kept at %s: %s", task.key, task.attempts, task.path, e)
+                self.failed.append(task)
+            else:
+                task.retry_at = time.monotonic() + self.retry_seconds * 2 ** (task.attempts - 1)
+                logger.warning("Archiving %s failed (attempt %d), will retry: %s", task.key, task.attempts, e)
+                self._retries.append(task)
+            return
+
+        if task.delete_after and os.path.exists(task.path):
+            os.remove(task.path)
+
+    def _run(self):
+        while not self._stopping.is_set() or not self._queue.empty():
+            try:
+                self._process(self._queue.get(timeout=0.5))
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            due = [task for task in self._retries if task.retry_at <= now]
+            for task in due:
+                self._retries.remove(task)
+                self._process(task)
+
+    def stop(self, timeout=30):
+        """
+            Finish the queued uploads (retries are not waited for) and stop.
+        """
+        self._stopping.set()
+        self._thread.join(timeout)
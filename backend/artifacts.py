@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import pandas as pd
+from score_table import artifact_version
+from scripts.compiled_preprocessing import CompiledPlan
+
+MODEL_PATH = os.environ.get("MODEL_PATH", "model2.pkl")
+PREPROCESSOR_PATH = os.environ.get("PREPROCESSOR_PATH", "preprocessor.pkl")
+# Exported artifacts (native XGBoost model + JSON plan), one subdirectory per version
+ARTIFACT_CACHE_DIR = os.environ.get("ARTIFACT_CACHE_DIR", "artifact_cache")
+
+# Applicant used for the warm-up prediction
+WARMUP_ROW = {
+    "Customer_ID": "WARMUP", "checking_status": "<0", "duration": 6,
+    "credit_history": "critical/other existing credit", "purpose": "radio/tv",
+    "credit_amount": 1169, "savings_status": "no known savings", "employment": ">=7",
+    "installment_commitment": 4, "personal_status": "male single", "other_parties": "none",
+    "residence_since": 4, "property_magnitude": "real estate", "age": 67,
+    "other_payment_plans": "none", "housing": "own", "existing_credits": 2, "job": "skilled",
+    "num_dependents": 1, "own_telephone": "yes", "foreign_worker": "yes", "class": "good",
+}
+
+
+def _export(model_path, preprocessor_path, export_dir):
+    """
+        Unpickle the training artifacts once and write them in formats that
+        load without sklearn objects or pickle.
+    """
+    import joblib
+    from scripts.compiled_preprocessing import compile_preprocessor
+
+    model = joblib.load(model_path)
+    plan = compile_preprocessor(joblib.load(preprocessor_path))
+
+    os.makedirs(os.path.dirname(export_dir) or ".", exist_ok=True)
+    staging = tempfile.mkdtemp(dir=os.path.dirname(export_dir) or ".")
+    model.save_model(os.path.join(staging, "model.ubj"))
+    plan.save(os.path.join(staging, "plan.json"))
+    try:
+        os.rename(staging, export_dir)
+    except OSError:
+        # Another process exported the same version first
+        shutil.rmtree(staging, ignore_errors=True)
+    return model, plan
+
+
+def load_artifacts(model_path=MODEL_PATH, preprocessor_path=PREPROCESSOR_PATH, cache_dir=ARTIFACT_CACHE_DIR):
+    """
+        Return (model, plan, version). The pickles are only read the first
+        time a version is seen; afterwards the exported copies are loaded.
+    """
+    from xgboost import XGBClassifier
+
+    version = artifact_version(model_path, preprocessor_path)
+    export_dir = os.path.join(cache_dir, version)
+    if not os.path.isdir(export_dir):
+        model, plan = _export(model_path, preprocessor_path, export_dir)
+        return model, plan, version
+
+    model = XGBClassifier()
+    model.load_model(os.path.join(export_dir, "model.ubj"))
+    plan = CompiledPlan.load(os.path.join(export_dir, "plan.json"))
+    return model, plan, version
+
+
+def warmup_frame():
+    return pd.DataFrame([WARMUP_ROW])
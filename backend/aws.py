@@ -0,0 +1,27 @@
+import threading
+
+
+class LazyClient:
+    """
+        boto3 client created on first use and shared by every module, so
+        importing the app neither imports boto3 nor builds a client.
+    """
+
+    def __init__(self, service):
+        self.service = service
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3
+                    self._client = boto3.client(self.service)
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+s3_client = LazyClient("s3")
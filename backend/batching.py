@@ -0,0 +1,152 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import pandas as pd
+from scoring import score_frame
+
+# How long the batcher waits for more customerID requests after the first one
+# arrives (0 disables batching and every request is scored on its own)
+ID_BATCH_WINDOW_MS = float(os.environ.get("ID_BATCH_WINDOW_MS", 2))
+# A batch is scored as soon as it holds this many rows, even inside the window
+ID_BATCH_MAX_ROWS = int(os.environ.get("ID_BATCH_MAX_ROWS", 64))
+
+
+class BatchRequest:
+    def __init__(self, frame):
+        self.frame = frame
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchStats:
+    """
+        Batch fill and queueing delay counters, updated by the batcher thread.
+    """
+
+    def __init__(self, max_rows):
+        self.max_rows = max_rows
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+        self.queue_delay_total = 0.0
+        self.queue_delay_max = 0.0
+
+    def record(self, batch, rows, started_at):
+        delays = [started_at - request.enqueued_at for request in batch]
+        self.batches += 1
+        self.requests += len(batch)
+        self.rows += rows
+        self.queue_delay_total += sum(delays)
+        self.queue_delay_max = max(self.queue_delay_max, max(delays))
+
+    def to_dict(self):
+        batches = max(self.batches, 1)
+        requests = max(self.requests, 1)
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "rows": self.rows,
+            "mean_batch_rows": round(self.rows / batches, 2),
+            "mean_batch_fill": round(self.rows / batches / self.max_rows, 4),
+            "mean_requests_per_batch": round(self.requests / batches, 2),
+            "mean_queue_delay_ms": round(self.queue_delay_total / requests * 1000, 3),
+            "max_queue_delay_ms": round(self.queue_delay_max * 1000, 3),
+        }
+
+
+class MicroBatcher:
+    """
+        Collects concurrent single-customer scoring calls for up to
+        `window_ms` (or `max_rows` rows) and scores them with one
+        plan.transform + predict_proba call. Callers block in `score` until
+        their own slice of the batch is ready, or await the future from
+        `submit` (async endpoints, so waiting does not hold a thread).
+    """
+
+    def __init__(self, model, plan, window_ms=ID_BATCH_WINDOW_MS, max_rows=ID_BATCH_MAX_ROWS):
+        self.model = model
+        self.plan = plan
+        self.window = window_ms / 1000
+        self.max_rows = max_rows
+        self.stats = BatchStats(max_rows)
+        self._queue = queue.Queue()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="id-batcher", daemon=True)
+        self._thread.start()
+
+    def score(self, frame):
+        """
+            Scores for the rows of `frame`, scored together with whatever
+            other requests arrive within the batching window.
+        """
+        return self.submit(frame).result()
+
+    def submit(self, frame):
+        """
+            Queue `frame` for the next batch; returns a Future of its scores.
+        """
+        request = BatchRequest(frame)
+        self._queue.put(request)
+        return request.future
+
+    def _collect(self):
+        """
+            Block for the first request, then take more until the window
+            closes or the batch is full.
+        """
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+
+        batch, rows = [first], len(first.frame)
+        deadline = first.enqueued_at + self.window
+        while rows < self.max_rows:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(request)
+            rows += len(request.frame)
+        return batch
+
+    def _score_batch(self, batch):
+        started_at = time.perf_counter()
+        frames = [request.frame for request in batch]
+        try:
+            combined = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+            scores = score_frame(combined, self.model, self.plan)
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        self.stats.record(batch, len(combined), started_at)
+        offset = 0
+        for request in batch:
+            rows = len(request.frame)
+            request.future.set_result(scores[offset:offset + rows])
+            offset += rows
+
+    def _run(self):
+        while not self._stopping.is_set() or not self._queue.empty():
+            batch = self._collect()
+            if batch:
+                self._score_batch(batch)
+
+    def stop(self, timeout=5):
+        self._stopping.set()
+        self._thread.join(timeout)
+
+
+def make_micro_batcher(model, plan, window_ms=ID_BATCH_WINDOW_MS, max_rows=ID_BATCH_MAX_ROWS):
+    """
+        MicroBatcher for customerID scoring, or None when ID_BATCH_WINDOW_MS
+        is 0.
+    """
+    if window_ms <= 0:
+        return None
+    return MicroBatcher(model, plan, window_ms, max_rows)
@@ -0,0 +1,130 @@
+"""
+    Load benchmark for POST /predict under concurrent mixed traffic:
+    customerID lookups and CSV file uploads at the same time.
+
+    Run from the backend directory:
+
+        python benchmarks/load_benchmark.py --id-clients 32 --file-clients 4 --duration 20
+
+    Without --url the app in --app-dir is started in-process with customer
+    data read from --customer-data and results archived to a temporary
+    directory, so no S3 access is made and the numbers only cover the server
+    itself. Point --app-dir at another checkout of backend/ to compare
+    before/after.
+"""
+import argparse
+import asyncio
+import io
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+import httpx
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app_dir, customer_data):
+    """Import the app from `app_dir`, keep it off S3 and serve it on a free port."""
+    import uvicorn
+
+    app_dir = os.path.abspath(app_dir)
+    customer_data = os.path.abspath(customer_data)
+    # Read when the app is imported: customer data and archival stay local
+    os.environ.setdefault("CUSTOMER_DATA_DIR", os.path.dirname(customer_data))
+    os.environ.setdefault("ARCHIVE_DIR", tempfile.mkdtemp(prefix="bench-archive-"))
+    os.chdir(app_dir)
+    sys.path.insert(0, app_dir)
+
+    import main
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    url = f"http://127.0.0.1:{port}"
+    # The model loads in the background after the server starts listening
+    while httpx.get(f"{url}/ready").status_code == 503:
+        time.sleep(0.05)
+    return url
+
+
+async def id_client(client, url, customer_ids, deadline, results):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.post(url, params={"customerID": random.choice(customer_ids)})
+        results.append((time.perf_counter() - start, response.status_code))
+
+
+async def file_client(client, url, payload, deadline, results):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.post(url, files={"file": ("bench.csv", payload, "text/csv")})
+        results.append((time.perf_counter() - start, response.status_code))
+
+
+def report(kind, results, duration):
+    if not results:
+        print(f"{kind:<6} no requests completed")
+        return
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    statuses = np.array([status for _, status in results])
+    ok = statuses == 200
+    ok_latencies = latencies[ok] if ok.any() else latencies
+    print(
+        f"{kind:<6} requests={len(results):<6} ok={int(ok.sum()):<6} 429={int((statuses == 429).sum()):<5} "
+        f"errors={int(((statuses != 200) & (statuses != 429)).sum()):<4} "
+        f"p50={np.percentile(ok_latencies, 50):8.1f}ms p99={np.percentile(ok_latencies, 99):8.1f}ms "
+        f"rps={ok.sum() / duration:7.1f}"
+    )
+
+
+async def run(args):
+    url = (args.url or start_server(args.app_dir, args.customer_data)).rstrip("/") + "/predict"
+
+    customers = pd.read_csv(args.customer_data)
+    customer_ids = customers["Customer_ID"].tolist()
+    upload = customers.sample(args.file_rows, replace=True, random_state=0)
+    payload = upload.to_csv(index=False).encode()
+
+    id_results, file_results = [], []
+    limits = httpx.Limits(max_connections=args.id_clients + args.file_clients)
+    async with httpx.AsyncClient(timeout=300, limits=limits) as client:
+        # Warm-up request per kind, not measured
+        await client.post(url, params={"customerID": customer_ids[0]})
+        await client.post(url, files={"file": ("bench.csv", payload, "text/csv")})
+
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(
+            *[id_client(client, url, customer_ids, deadline, id_results) for _ in range(args.id_clients)],
+            *[file_client(client, url, payload, deadline, file_results) for _ in range(args.file_clients)],
+        )
+
+    print(f"{args.id_clients} ID clients, {args.file_clients} file clients ({args.file_rows} rows), {args.duration}s")
+    report("id", id_results, args.duration)
+    report("file", file_results, args.duration)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running server (default: start the app in-process)")
+    parser.add_argument("--app-dir", default=os.path.join(os.path.dirname(__file__), ".."))
+    parser.add_argument("--customer-data", default=os.path.join(os.path.dirname(__file__), "..", "..", "raw_data1.csv"))
+    parser.add_argument("--id-clients", type=int, default=32)
+    parser.add_argument("--file-clients", type=int, default=4)
+    parser.add_argument("--file-rows", type=int, default=5000)
+    parser.add_argument("--duration", type=float, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
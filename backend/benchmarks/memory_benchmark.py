@@ -0,0 +1,96 @@
+"""
+    Peak memory of scoring one large upload, per scenario:
+
+      read     read_frame of the CSV (the frame predict_with_file holds)
+      score    read, transform, predict_proba and labels added to the frame
+      stream   score_stream into a CSV result, chunk by chunk
+
+    Each scenario runs in a fresh process; the figure reported is how far
+    its peak RSS rose above the process after imports and model loading.
+    Run from the backend directory:
+
+        python benchmarks/memory_benchmark.py --rows 1000000
+
+    Set LOW_MEMORY_FRAMES=0 to read with plain object/int64 columns, or
+    point --app-dir at another checkout of backend/ to compare before/after.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS = ["read", "score", "stream"]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_scenario(scenario, path, app_dir):
+    app_dir = os.path.abspath(app_dir)
+    os.chdir(app_dir)
+    sys.path.insert(0, app_dir)
+    import numpy as np
+    from artifacts import load_artifacts
+    from io_formats import read_frame, ResultWriter
+    from labeling import DEFAULT_TIERS
+    from predict_with_file import score_stream
+    from scoring import score_frame
+
+    model, plan, _ = load_artifacts()
+    before = peak_rss_mb()
+
+    if scenario == "read":
+        frame = read_frame(path, "csv")
+    elif scenario == "score":
+        frame = read_frame(path, "csv")
+        scores = np.round(score_frame(frame, model, plan).astype(float), 3)
+        frame["ID"] = np.arange(1, len(frame) + 1)
+        frame["Score"] = scores
+        frame["Label"], _ = DEFAULT_TIERS.label(scores)
+    else:
+        with tempfile.NamedTemporaryFile(suffix=".csv") as result, ResultWriter(result.name, "csv") as writer:
+            score_stream(path, writer, model, plan)
+
+    return {"scenario": scenario, "baseline_mb": before, "peak_mb": peak_rss_mb(),
+            "increase_mb": peak_rss_mb() - before}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--app-dir", default=os.path.join(BENCHMARK_DIR, ".."))
+    parser.add_argument("--scenarios", nargs="+", default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument("--input", help="CSV to score (default: generate --rows synthetic applicants)")
+    parser.add_argument("--worker", choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_scenario(args.worker, args.input, args.app_dir)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.input
+        if path is None:
+            from synthetic_data import make_applicants
+            path = os.path.join(tmp, "applicants.csv")
+            make_applicants(args.rows, args.seed).to_csv(path, index=False)
+        path = os.path.abspath(path)
+        print(f"{os.path.getsize(path) / 2**20:.0f}MB input, LOW_MEMORY_FRAMES={os.environ.get('LOW_MEMORY_FRAMES', '1')}")
+
+        for scenario in args.scenarios:
+            command = [sys.executable, os.path.abspath(__file__), "--worker", scenario, "--input", path,
+                       "--app-dir", args.app_dir]
+            completed = subprocess.run(command, stdout=subprocess.PIPE, check=True)
+            result = json.loads(completed.stdout.decode().strip().splitlines()[-1])
+            print(f"  {scenario:<8} +{result['increase_mb']:7.0f}MB (peak RSS {result['peak_mb']:.0f}MB)")
+
+
+if __name__ == "__main__":
+    main()
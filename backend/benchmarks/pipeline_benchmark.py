@@ -0,0 +1,218 @@
+"""
+    Per-stage benchmark of the scoring pipeline on synthetic applicants
+    (see synthetic_data.py) at 1k, 100k and 1M rows:
+
+      parse                pd.read_csv of the upload bytes
+      engineer_features    scripts/new_preprocessing.engineer_features
+      apply_preprocessing  the fitted sklearn preprocessor (training path)
+      transform            the compiled plan used when serving
+      predict_proba        XGBoost on the transformed matrix
+      labeling             tier labels and counts
+      serialize            NDJSON body of the streamed response
+      result_write         CSV result file
+      end_to_end           POST /predict through a TestClient, no S3 access
+
+    Each size runs in its own process, so peak RSS is per size. Run from the
+    backend directory:
+
+        python benchmarks/pipeline_benchmark.py                   # report only
+        python benchmarks/pipeline_benchmark.py --save-baseline   # record baselines.json
+        python benchmarks/pipeline_benchmark.py --check           # exit 1 on a regression
+
+    A stage regresses when its p50 is more than --tolerance above the
+    baseline (and by more than --min-delta-ms), a size when its peak RSS
+    is. Baselines depend on the machine: record them where --check runs.
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baselines.json")
+STAGES = ["parse", "engineer_features", "apply_preprocessing", "transform", "predict_proba", "labeling",
+          "serialize", "result_write", "end_to_end"]
+
+
+def timed(fn, repeats):
+    """
+        Call fn `repeats` times; return (seconds per call, last result).
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+
+def summarize(times, rows):
+    return {
+        "p50": float(np.percentile(times, 50)),
+        "p95": float(np.percentile(times, 95)),
+        "max": float(np.max(times)),
+        "rows_per_second": rows / float(np.percentile(times, 50)),
+    }
+
+
+def start_app(app_dir, customer_data):
+    """
+        TestClient for the app in `app_dir` with customer data read from
+        `customer_data` and archival going to a temporary directory.
+    """
+    os.environ.setdefault("CUSTOMER_DATA_DIR", os.path.dirname(os.path.abspath(customer_data)))
+    os.environ.setdefault("ARCHIVE_DIR", tempfile.mkdtemp(prefix="bench-archive-"))
+    os.environ.setdefault("WARMUP_IN_BACKGROUND", "0")
+    os.environ.setdefault("MODEL_POLL_SECONDS", "0")
+    # Repeated uploads of the same file would otherwise be served from the cache
+    os.environ.setdefault("PREDICTION_CACHE_ROWS", "0")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    import main
+
+    from fastapi.testclient import TestClient
+    client = TestClient(main.app)
+    client.__enter__()
+    return client
+
+
+def run_size(rows, repeats, args):
+    """
+        Benchmark every stage on `rows` synthetic applicants in this process.
+    """
+    import pandas as pd
+    import joblib
+
+    app_dir = os.path.abspath(args.app_dir)
+    os.chdir(app_dir)
+    sys.path.insert(0, app_dir)
+    from artifacts import load_artifacts, PREPROCESSOR_PATH
+    from labeling import DEFAULT_TIERS
+    from io_formats import write_frame
+    from serialization import ndjson_lines
+    from scripts.new_preprocessing import engineer_features, apply_preprocessing
+    from synthetic_data import make_applicants
+
+    client = start_app(app_dir, args.customer_data)
+    model, plan, _ = load_artifacts()
+    preprocessor = joblib.load(PREPROCESSOR_PATH)
+    payload = make_applicants(rows, args.seed).to_csv(index=False).encode()
+
+    results = {}
+    results["parse"], raw = timed(lambda: pd.read_csv(io.BytesIO(payload)), repeats)
+    results["engineer_features"], _ = timed(lambda: engineer_features(raw), repeats)
+    results["apply_preprocessing"], _ = timed(lambda: apply_preprocessing(raw, preprocessor), repeats)
+    results["transform"], features = timed(lambda: plan.transform(raw), repeats)
+    results["predict_proba"], scores = timed(lambda: model.predict_proba(features)[:, 1], repeats)
+    results["labeling"], (labels, _) = timed(lambda: DEFAULT_TIERS.label(np.round(scores, 3)), repeats)
+
+    scored = raw.assign(ID=np.arange(1, rows + 1), Score=np.round(scores, 3), Label=labels)
+    results["serialize"], _ = timed(lambda: ndjson_lines(scored), repeats)
+    with tempfile.NamedTemporaryFile(suffix=".csv") as result_file:
+        results["result_write"], _ = timed(lambda: write_frame(scored, result_file.name, "csv"), repeats)
+    del scored, features
+
+    def post():
+        response = client.post("/predict", params={"response_format": args.response_format},
+                               files={"file": ("bench.csv", payload, "text/csv")})
+        response.raise_for_status()
+    results["end_to_end"], _ = timed(post, repeats)
+    client.__exit__(None, None, None)
+
+    # ru_maxrss is in kilobytes on Linux
+    return {
+        "rows": rows,
+        "repeats": repeats,
+        "stages": {name: summarize(times, rows) for name, times in results.items()},
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def run_in_subprocess(rows, args):
+    command = [sys.executable, os.path.abspath(__file__), "--worker", str(rows),
+               "--repeats", str(args.repeats), "--app-dir", args.app_dir, "--customer-data", args.customer_data,
+               "--seed", str(args.seed), "--response-format", args.response_format]
+    completed = subprocess.run(command, stdout=subprocess.PIPE, check=True)
+    return json.loads(completed.stdout.decode().strip().splitlines()[-1])
+
+
+def report(result, baseline, tolerance, min_delta):
+    """
+        Print one size's results next to its baseline. Returns the list of
+        regressions.
+    """
+    regressions = []
+    print(f"\n{result['rows']:,} rows ({result['repeats']} runs)")
+    print(f"  {'stage':<20} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10} {'rows/s':>12} {'vs base':>8}")
+    for name in STAGES:
+        stats = result["stages"][name]
+        base = (baseline or {}).get("stages", {}).get(name)
+        ratio = stats["p50"] / base["p50"] if base else None
+        # Tiny stages are noisy; a few milliseconds over is not a regression
+        if ratio is not None and ratio > 1 + tolerance and stats["p50"] - base["p50"] > min_delta:
+            regressions.append(f"{result['rows']} rows: {name} p50 {ratio:.2f}x baseline")
+        print(f"  {name:<20} {stats['p50'] * 1000:>10.1f} {stats['p95'] * 1000:>10.1f} {stats['max'] * 1000:>10.1f} "
+              f"{stats['rows_per_second']:>12,.0f} {f'{ratio:.2f}x' if ratio else '-':>8}")
+
+    ratio = result["peak_rss_mb"] / baseline["peak_rss_mb"] if baseline else None
+    if ratio is not None and ratio > 1 + tolerance:
+        regressions.append(f"{result['rows']} rows: peak RSS {ratio:.2f}x baseline")
+    print(f"  {'peak RSS':<20} {result['peak_rss_mb']:>9.0f}M {'':>34} {f'{ratio:.2f}x' if ratio else '-':>8}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--app-dir", default=os.path.join(BENCHMARK_DIR, ".."))
+    parser.add_argument("--customer-data", default=os.path.join(BENCHMARK_DIR, "..", "..", "raw_data1.csv"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--response-format", default="summary",
+                        help="response_format for the end_to_end /predict request (default: summary)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if a stage regressed against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=5,
+                        help="Ignore stage slowdowns smaller than this in absolute terms")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.customer_data = os.path.abspath(args.customer_data)
+
+    if args.worker:
+        print(json.dumps(run_size(args.worker, args.repeats, args)))
+        return
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+
+    results, regressions = {}, []
+    for rows in args.rows:
+        result = run_in_subprocess(rows, args)
+        results[str(rows)] = result
+        regressions += report(result, baselines.get(str(rows)), args.tolerance,
+                              args.min_delta_ms / 1000)
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.baseline}")
+
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
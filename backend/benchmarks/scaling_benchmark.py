@@ -0,0 +1,186 @@
+"""
+    Request throughput against worker count on one host: the app is served
+    by gunicorn (gunicorn.conf.py) with 1, 2, 4 ... workers in turn and
+    driven with the mixed traffic of load_benchmark.py each time.
+
+    Also reports the memory of the whole server, master plus workers:
+    summed RSS, and PSS, which splits shared pages (the memory-mapped
+    customer snapshot and index) between the processes that map them.
+    Run from the backend directory:
+
+        python benchmarks/scaling_benchmark.py --workers 1 2 4 --duration 20
+        python benchmarks/scaling_benchmark.py --workers 1 4 --no-shared   # per-worker customer data
+
+    Customer data comes from --customer-data via CUSTOMER_DATA_DIR and
+    results are archived to a temporary directory, so no S3 access is
+    needed. Throughput only scales up to the number of CPUs, which the
+    load generator shares.
+"""
+import argparse
+import asyncio
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import httpx
+from load_benchmark import free_port, id_client, file_client, report
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def start_gunicorn(workers, args, tmp):
+    """
+        gunicorn with `workers` workers on a free port; returns (process, url)
+        once every worker reports ready on GET /workers.
+    """
+    # The app reads CUSTOMER_DATA_DIR/raw_data1.csv
+    data_dir = os.path.join(tmp, "data")
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+        os.symlink(os.path.abspath(args.customer_data), os.path.join(data_dir, "raw_data1.csv"))
+
+    url = f"http://127.0.0.1:{free_port()}"
+    env = {
+        **os.environ,
+        "WEB_CONCURRENCY": str(workers),
+        "BIND": url[len("http://"):],
+        "CUSTOMER_DATA_DIR": data_dir,
+        "SHARED_STATE_DIR": os.path.join(tmp, "shared"),
+        "ARCHIVE_DIR": os.path.join(tmp, "archive"),
+        "JOB_DIR": os.path.join(tmp, "jobs"),
+        "RESULTS_DIR": os.path.join(tmp, "results"),
+        "MODEL_POLL_SECONDS": "0",
+        # Repeated uploads of the same file would otherwise be served from the cache
+        "PREDICTION_CACHE_ROWS": "0",
+        "WORKER_HEARTBEAT_SECONDS": "1",
+        "LOG_LEVEL": "WARNING",
+    }
+    if args.no_shared:
+        env["CUSTOMER_STORE_CACHE"] = ""
+
+    process = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"],
+                               cwd=os.path.abspath(args.app_dir), env=env)
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {process.returncode}")
+        try:
+            response = httpx.get(f"{url}/workers")
+            if response.status_code == 200 and len(response.json()["workers"]) == workers:
+                return process, url
+        except httpx.TransportError:
+            pass
+        time.sleep(0.5)
+    stop_gunicorn(process)
+    raise RuntimeError(f"{workers} workers not ready after {args.startup_timeout}s")
+
+
+def stop_gunicorn(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def process_tree(pid):
+    pids = [pid]
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            pids += [child for ppid in f.read().split() for child in process_tree(int(ppid))]
+    return pids
+
+
+def memory_mb(pid):
+    """
+        (RSS, PSS) in MB summed over a process and its children (Linux).
+    """
+    rss = pss = 0
+    for member in process_tree(pid):
+        with open(f"/proc/{member}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Rss:"):
+                    rss += int(line.split()[1])
+                elif line.startswith("Pss:"):
+                    pss += int(line.split()[1])
+    return rss / 1024, pss / 1024
+
+
+def rps(results, duration):
+    return sum(status == 200 for _, status in results) / duration
+
+
+def p99_ms(results):
+    latencies = [latency for latency, status in results if status == 200]
+    return float(np.percentile(latencies, 99)) * 1000 if latencies else float("nan")
+
+
+async def drive(url, customer_ids, payload, args):
+    id_results, file_results = [], []
+    limits = httpx.Limits(max_connections=args.id_clients + args.file_clients)
+    async with httpx.AsyncClient(timeout=300, limits=limits) as client:
+        # Every worker gets a few warm-up requests before the clock starts
+        for _ in range(4 * args.id_clients):
+            await client.post(url, params={"customerID": random.choice(customer_ids)})
+        if args.file_clients:
+            await client.post(url, files={"file": ("bench.csv", payload, "text/csv")})
+
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(
+            *[id_client(client, url, customer_ids, deadline, id_results) for _ in range(args.id_clients)],
+            *[file_client(client, url, payload, deadline, file_results) for _ in range(args.file_clients)],
+        )
+    return id_results, file_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--app-dir", default=os.path.join(BENCHMARK_DIR, ".."))
+    parser.add_argument("--customer-data", default=os.path.join(BENCHMARK_DIR, "..", "..", "raw_data1.csv"))
+    parser.add_argument("--id-clients", type=int, default=32)
+    parser.add_argument("--file-clients", type=int, default=2)
+    parser.add_argument("--file-rows", type=int, default=5000)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--no-shared", action="store_true",
+                        help="Give every worker its own copy of the customer data (no mmapped snapshot)")
+    args = parser.parse_args()
+
+    customers = pd.read_csv(args.customer_data)
+    customer_ids = customers["Customer_ID"].tolist()
+    payload = customers.sample(args.file_rows, replace=True, random_state=0).to_csv(index=False).encode()
+
+    print(f"{os.cpu_count()} CPUs, {len(customers):,} customers, {args.id_clients} ID clients, "
+          f"{args.file_clients} file clients ({args.file_rows} rows), {args.duration}s per run")
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="scaling-bench-") as tmp:
+        for workers in args.workers:
+            process, url = start_gunicorn(workers, args, tmp)
+            try:
+                id_results, file_results = asyncio.run(drive(f"{url}/predict", customer_ids, payload, args))
+                rss, pss = memory_mb(process.pid)
+            finally:
+                stop_gunicorn(process)
+
+            print(f"\n{workers} worker(s)")
+            report("id", id_results, args.duration)
+            report("file", file_results, args.duration)
+            rows.append((workers, rps(id_results, args.duration), p99_ms(id_results),
+                         rps(file_results, args.duration), rss, pss))
+
+    base = rows[0][1] or float("nan")
+    print(f"\n{'workers':>7} {'id rps':>9} {'speedup':>8} {'id p99 ms':>10} {'file rps':>9} {'RSS MB':>8} {'PSS MB':>8}")
+    for workers, id_rps, id_p99, file_rps, rss, pss in rows:
+        print(f"{workers:>7} {id_rps:>9.1f} {id_rps / base:>7.2f}x {id_p99:>10.1f} {file_rps:>9.2f} "
+              f"{rss:>8.0f} {pss:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
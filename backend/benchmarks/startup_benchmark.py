@@ -0,0 +1,108 @@
+"""
+    Cold-start benchmark: starts the server in a fresh process and measures
+
+      listening   first HTTP response of any kind
+      ready       GET /ready returns 200 (skipped if the app has no /ready)
+      predict     first successful POST /predict with a small CSV upload
+
+    Run from the backend directory:
+
+        python benchmarks/startup_benchmark.py --runs 5
+
+    Customer data is read from --customer-data and results are archived to
+    a temporary directory, so no S3 access is needed. Point --app-dir at
+    another checkout of backend/ to compare before/after.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import httpx
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(fn, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if fn():
+                return True
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    raise TimeoutError("Server did not come up in time")
+
+
+def one_run(args, payload, archive_dir):
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = dict(
+        os.environ,
+        CUSTOMER_DATA_DIR=os.path.dirname(os.path.abspath(args.customer_data)),
+        ARCHIVE_DIR=archive_dir,
+    )
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.abspath(args.app_dir), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    timings = {}
+    try:
+        with httpx.Client(timeout=60) as client:
+            ready = {}
+
+            def listening():
+                ready["status"] = client.get(f"{base}/ready").status_code
+                return True
+            wait_for(listening, args.timeout)
+            timings["listening"] = time.perf_counter() - start
+
+            if ready["status"] != 404:
+                wait_for(lambda: client.get(f"{base}/ready").status_code == 200, args.timeout)
+                timings["ready"] = time.perf_counter() - start
+
+            def predicted():
+                response = client.post(f"{base}/predict", files={"file": ("bench.csv", payload, "text/csv")})
+                return response.status_code == 200
+            wait_for(predicted, args.timeout)
+            timings["predict"] = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app-dir", default=os.path.join(os.path.dirname(__file__), ".."))
+    parser.add_argument("--customer-data", default=os.path.join(os.path.dirname(__file__), "..", "..", "raw_data1.csv"))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    with open(args.customer_data, "rb") as f:
+        payload = b"".join(f.readlines()[:11])
+
+    runs = []
+    with tempfile.TemporaryDirectory() as archive_dir:
+        for _ in range(args.runs):
+            runs.append(one_run(args, payload, archive_dir))
+
+    print(f"{args.runs} cold starts of {os.path.abspath(args.app_dir)}")
+    for stage in ("listening", "ready", "predict"):
+        values = [run[stage] for run in runs if stage in run]
+        if values:
+            print(f"{stage:<10} median={np.median(values):6.2f}s min={min(values):6.2f}s max={max(values):6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
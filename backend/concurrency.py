@@ -0,0 +1,68 @@
+import asyncio
+import contextlib
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+
+# Interactive (customerID) scoring: many small, latency-sensitive calls
+ID_SCORING_THREADS = int(os.environ.get("ID_SCORING_THREADS", 8))
+ID_SCORING_MAX_PENDING = int(os.environ.get("ID_SCORING_MAX_PENDING", 256))
+
+# File scoring: few large calls; kept apart so uploads cannot starve ID lookups
+FILE_SCORING_THREADS = int(os.environ.get("FILE_SCORING_THREADS", 2))
+FILE_SCORING_MAX_PENDING = int(os.environ.get("FILE_SCORING_MAX_PENDING", 8))
+
+
+class BoundedExecutor:
+    """
+        Thread pool for blocking work (pandas, XGBoost, boto3) called from
+        async endpoints. At most `max_pending` calls may be running or queued;
+        beyond that callers get a 429 instead of piling up on the server.
+    """
+
+    def __init__(self, name, workers, max_pending):
+        self.name = name
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pending = 0  # only touched from the event loop thread
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+
+    @property
+    def pending(self):
+        return self._pending
+
+    @contextlib.contextmanager
+    def admit(self):
+        """
+            Count the caller as pending for the duration of the block, or
+            raise a 429 when max_pending calls already are.
+        """
+        if self._pending >= self.max_pending:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many {self.name} requests in progress, retry later.",
+                headers={"Retry-After": "1"}
+            )
+
+        self._pending += 1
+        try:
+            yield
+        finally:
+            self._pending -= 1
+
+    async def call(self, fn, *args, **kwargs):
+        # No max_pending check; for callers already inside admit()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    async def run(self, fn, *args, **kwargs):
+        with self.admit():
+            return await self.call(fn, *args, **kwargs)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+id_scoring_pool = BoundedExecutor("id-scoring", ID_SCORING_THREADS, ID_SCORING_MAX_PENDING)
+file_scoring_pool = BoundedExecutor("file-scoring", FILE_SCORING_THREADS, FILE_SCORING_MAX_PENDING)
@@ -0,0 +1,247 @@
+import fcntl
+import io
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from io_formats import (read_frame, format_from_name, save_snapshot, load_snapshot, read_arrow_table,
+                        snapshot_metadata, arrow_frame)
+from id_index import IdIndex, index_path
+
+BUCKET_NAME = "a-sample-bajaj-bucket"
+PREFIX = "sample-bajaj-local"
+CUSTOMER_DATA_KEY = f"{PREFIX}/raw/raw_data1.csv"
+CUSTOMER_DATA_FILE = "raw_data1.csv"
+
+# How often (seconds) the store asks the source whether the file changed
+REFRESH_INTERVAL = float(os.environ.get("CUSTOMER_STORE_REFRESH_SECONDS", 60))
+# Optional .parquet / .arrow snapshot of the parsed data, reused across restarts.
+# An .arrow snapshot is served memory-mapped with a saved ID index, so all
+# worker processes on a host share one copy (see gunicorn.conf.py)
+CUSTOMER_STORE_CACHE = os.environ.get("CUSTOMER_STORE_CACHE")
+
+logger = logging.getLogger(__name__)
+
+
+class S3Source:
+    """
+        Customer master file stored in S3. Works with any boto3-compatible
+        client (a moto-backed client can be passed in for testing).
+    """
+
+    def __init__(self, s3_client, bucket=BUCKET_NAME, key=CUSTOMER_DATA_KEY):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.name = key
+
+    def version(self):
+        head = self.s3_client.head_object(Bucket=self.bucket, Key=self.key)
+        return head.get("ETag") or str(head.get("LastModified"))
+
+    def fetch(self):
+        response = self.s3_client.get_object(Bucket=self.bucket, Key=self.key)
+        version = response.get("ETag") or str(response.get("LastModified"))
+        return response["Body"], version
+
+    def __repr__(self):
+        return f"s3://{self.bucket}/{self.key}"
+
+
+class LocalSource:
+    """
+        Customer master file on the local filesystem.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.name = path
+
+    def version(self):
+        stat = os.stat(self.path)
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def fetch(self):
+        version = self.version()
+        return open(self.path, "rb"), version
+
+    def __repr__(self):
+        return self.path
+
+
+@contextmanager
+def file_lock(path):
+    """
+        Exclusive lock shared with other processes on this host.
+    """
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class CustomerStore:
+    """
+        In-memory copy of the customer master file with a hash index on
+        Customer_ID. The file is fetched once and only fetched again when
+        the source reports a new ETag / modification time. With an Arrow
+        cache_path the data and index are memory-mapped from disk instead.
+    """
+
+    def __init__(self, source, refresh_interval=REFRESH_INTERVAL, cache_path=CUSTOMER_STORE_CACHE):
+        self.source = source
+        self.refresh_interval = refresh_interval
+        self.cache_path = cache_path
+        self.shared = bool(cache_path) and format_from_name(cache_path) == "arrow"
+        self._snapshot = None  # (data, index, version), swapped atomically
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        snapshot = self._snapshot
+        return snapshot[2] if snapshot is not None else None
+
+    @property
+    def data(self):
+        return self._ensure_loaded()[0]
+
+    def _load_cached(self):
+        """
+            Data from the snapshot file if it was taken from the current
+            source version, else None.
+        """
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        data, metadata = load_snapshot(self.cache_path)
+        version = metadata.get("version")
+        if version != self.source.version():
+            return None
+        return data, version
+
+    def _fetch(self):
+        body, version = self.source.fetch()
+        try:
+            fmt = format_from_name(self.source.name) or "csv"
+            if fmt != "csv":
+                # Columnar readers need a seekable file
+                body = io.BytesIO(body.read())
+            data = read_frame(body, fmt, columns=None)
+        finally:
+            body.close()
+
+        if self.cache_path:
+            save_snapshot(data, self.cache_path, {"version": version})
+        return data, version
+
+    def _load_shared(self):
+        """
+            Memory-mapped snapshot and ID index. Whichever process takes the
+            lock first fetches the source and writes both; the others map
+            what it wrote.
+        """
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        with file_lock(f"{self.cache_path}.lock"):
+            table = read_arrow_table(self.cache_path) if os.path.exists(self.cache_path) else None
+            if table is None or snapshot_metadata(table).get("version") != self.source.version():
+                self._fetch()
+                table = read_arrow_table(self.cache_path)
+
+            version = snapshot_metadata(table)["version"]
+            data = arrow_frame(table)
+            ids = data["Customer_ID"].array
+            index = IdIndex.load(index_path(self.cache_path), ids, version)
+            if index is None:
+                index = IdIndex.build(ids)
+                index.save(index_path(self.cache_path), version)
+        return data, index, version
+
+    def load(self):
+        """
+            Fetch and parse the source (or reuse a current snapshot), then swap
+            in the new data and index.
+        """
+        if self.shared:
+            data, index, version = self._load_shared()
+        else:
+            data, version = self._load_cached() or self._fetch()
+            index = data.groupby("Customer_ID", sort=False).indices
+        self._snapshot = (data, index, version)
+        self._last_check = time.monotonic()
+        logger.info("Customer store loaded %d rows from %s (version %s)", len(data), self.source, version)
+        return self._snapshot
+
+    def refresh(self, force=False):
+        """
+            Reload the data if the source changed. Unless forced, the source is
+            asked at most once every `refresh_interval` seconds.
+        """
+        if not force and time.monotonic() - self._last_check < self.refresh_interval:
+            return False
+
+        # Only one caller refreshes; the others keep serving the current snapshot
+        if not self._lock.acquire(blocking=self._snapshot is None):
+            return False
+        try:
+            self._last_check = time.monotonic()
+            if self._snapshot is not None and self.source.version() == self._snapshot[2]:
+                return False
+            self.load()
+            return True
+        finally:
+            self._lock.release()
+
+    def _ensure_loaded(self):
+        if self._snapshot is None:
+            self.refresh(force=True)
+        else:
+            self.refresh()
+        return self._snapshot
+
+    def lookup(self, customer_id):
+        """
+            Return the rows for `customer_id` as a DataFrame, or None if the
+            customer is unknown.
+        """
+        data, index, _ = self._ensure_loaded()
+        positions = index.get(customer_id)
+        if positions is None:
+            return None
+        return data.iloc[positions]
+
+    def lookup_many(self, customer_ids):
+        """
+            Resolve many IDs in one pass over the index. Returns the first
+            row of each known customer (in request order) plus the lists of
+            found and not-found IDs.
+        """
+        data, index, _ = self._ensure_loaded()
+        if isinstance(index, IdIndex):
+            rows = index.get_many(customer_ids)
+            known = rows >= 0
+            found = [customer_id for customer_id, hit in zip(customer_ids, known) if hit]
+            not_found = [customer_id for customer_id, hit in zip(customer_ids, known) if not hit]
+            return data.iloc[rows[known]], found, not_found
+
+        positions, found, not_found = [], [], []
+        for customer_id in customer_ids:
+            rows = index.get(customer_id)
+            if rows is None:
+                not_found.append(customer_id)
+            else:
+                positions.append(rows[0])
+                found.append(customer_id)
+        return data.iloc[positions], found, not_found
+
+
+def default_source(s3_client):
+    """
+        Local directory if CUSTOMER_DATA_DIR is set, S3 otherwise.
+    """
+    data_dir = os.environ.get("CUSTOMER_DATA_DIR")
+    if data_dir:
+        return LocalSource(os.path.join(data_dir, CUSTOMER_DATA_FILE))
+    return S3Source(s3_client)
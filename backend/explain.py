@@ -0,0 +1,127 @@
+import os
+import numpy as np
+import pandas as pd
+from metrics import stage
+from scoring import SCORE_BLOCK_ROWS
+from scripts.compiled_preprocessing import PERSONAL_STATUS_PARTS
+from scripts.feature_constants import ENGINEERED_SOURCES
+
+# Saabas approximation instead of exact TreeSHAP contributions: several
+# times cheaper on large uploads, less exact per feature
+EXPLAIN_APPROX = os.environ.get("EXPLAIN_APPROX", "0") == "1"
+
+
+def raw_columns(plan):
+    """
+        Raw input columns behind each model feature: the field a one-hot
+        column encodes, personal_status for gender / marital_status, the
+        source fields of an engineered feature, and the feature itself for
+        the other numeric columns.
+    """
+    columns = [None] * plan.n_features
+    for name, idx, _, _ in plan.numeric:
+        columns[idx] = name
+    for col, positions in plan.categorical.items():
+        for idx in positions.values():
+            columns[idx] = col
+    for name, idx in plan.binary:
+        columns[idx] = name
+    return [ENGINEERED_SOURCES.get(col, ["personal_status" if col in PERSONAL_STATUS_PARTS else col])
+            for col in columns]
+
+
+class Explainer:
+    """
+        Scores rows together with their top_k feature contributions (XGBoost
+        pred_contribs, in log-odds of the positive class), both from the same
+        feature matrix. Contributions of the model features that come from
+        one raw column are summed, so a field counts once however many
+        one-hot columns it has. An engineered feature's contribution is
+        split evenly between the raw columns it is computed from.
+    """
+
+    def __init__(self, model, plan, top_k=3, approx=EXPLAIN_APPROX):
+        self.model = model
+        self.plan = plan
+        self.approx = approx
+        sources = raw_columns(plan)
+        self.names = list(dict.fromkeys(col for cols in sources for col in cols))
+        self.top_k = min(top_k, len(self.names))
+        # features x raw columns: each feature's share of its contribution
+        # that goes to each raw column (each row sums to 1)
+        self.groups = np.zeros((len(sources), len(self.names)), dtype=np.float32)
+        for feature, cols in enumerate(sources):
+            for col in cols:
+                self.groups[feature, self.names.index(col)] += 1 / len(cols)
+
+    def contributions(self, features):
+        """
+            Contribution of every raw column for each row of `features`.
+        """
+        from xgboost import DMatrix
+        contribs = self.model.get_booster().predict(DMatrix(features), pred_contribs=True,
+                                                    approx_contribs=self.approx, validate_features=False)
+        # Last column is the bias term
+        return contribs[:, :-1] @ self.groups
+
+    def top(self, grouped):
+        """
+            (column indices, contributions) of the top_k largest absolute
+            contributions per row, largest first.
+        """
+        if self.top_k < len(self.names):
+            picked = np.argpartition(-np.abs(grouped), self.top_k - 1, axis=1)[:, :self.top_k]
+        else:
+            picked = np.broadcast_to(np.arange(len(self.names)), grouped.shape)
+        values = np.take_along_axis(grouped, picked, axis=1)
+        order = np.argsort(-np.abs(values), axis=1, kind="stable")
+        return np.take_along_axis(picked, order, axis=1), np.take_along_axis(values, order, axis=1)
+
+    def score(self, raw_data, block_rows=SCORE_BLOCK_ROWS):
+        """
+            Return (scores, top column indices, top contributions) for raw
+            customer rows. The indices refer to `names`.
+        """
+        scores = np.empty(len(raw_data), dtype=np.float32)
+        indices = np.empty((len(raw_data), self.top_k), dtype=np.intp)
+        values = np.empty((len(raw_data), self.top_k), dtype=np.float32)
+        step = block_rows if block_rows > 0 else max(len(raw_data), 1)
+
+        for start in range(0, len(raw_data), step):
+            block = raw_data.iloc[start:start + step]
+            with stage("transform", rows=len(block)):
+                features = self.plan.transform(block)
+            with stage("predict", rows=len(block)):
+                scores[start:start + step] = self.model.predict_proba(features)[:, 1]
+            with stage("explain", rows=len(block)):
+                indices[start:start + step], values[start:start + step] = self.top(self.contributions(features))
+        return scores, indices, values
+
+    def columns(self, indices, values):
+        """
+            Flat result columns Top1_Feature, Top1_Contribution, ... for
+            each of the top_k contributions.
+        """
+        columns = {}
+        for rank in range(self.top_k):
+            columns[f"Top{rank + 1}_Feature"] = pd.Categorical.from_codes(indices[:, rank], categories=self.names)
+            columns[f"Top{rank + 1}_Contribution"] = np.round(values[:, rank].astype(float), 4)
+        return columns
+
+    def records(self, indices, values, row=0):
+        """
+            [{"feature", "contribution"}, ...] for one row, largest first.
+        """
+        return [
+            {"feature": self.names[idx], "contribution": round(float(value), 4)}
+            for idx, value in zip(indices[row], values[row])
+        ]
+
+
+def make_explainer(model, plan, top_k):
+    """
+        Explainer for a request's `explain` parameter, or None when it is 0.
+    """
+    if not top_k:
+        return None
+    return Explainer(model, plan, top_k)
@@ -0,0 +1,55 @@
+# Multi-worker serving on one host:
+#
+#     cd backend
+#     gunicorn -c gunicorn.conf.py main:app
+#
+# Each worker is a separate process with its own model and event loop. The
+# customer data and its ID index are memory-mapped from an Arrow snapshot
+# under SHARED_STATE_DIR (the first worker to start writes it), so they are
+# held in memory once per host rather than once per worker. GET /workers
+# reports the health of every worker, and GET /metrics the counters and
+# histograms of all of them.
+import glob
+import multiprocessing
+import os
+import tempfile
+
+# Worker processes (default: one per CPU)
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+# A worker whose event loop does not check in for this long is killed and replaced
+timeout = int(os.environ.get("WORKER_TIMEOUT", 120))
+graceful_timeout = 30
+
+# Files shared by the workers; /dev/shm keeps them in memory where available
+SHARED_STATE_DIR = os.environ.get("SHARED_STATE_DIR", os.path.join(
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "cred-bounce-back"))
+
+# Read by the workers when they import the app
+os.environ.setdefault("CUSTOMER_STORE_CACHE", os.path.join(SHARED_STATE_DIR, "customers.arrow"))
+os.environ.setdefault("WORKER_STATUS_DIR", os.path.join(SHARED_STATE_DIR, "workers"))
+# Prometheus counters and histograms of all workers, summed on every scrape
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(SHARED_STATE_DIR, "prometheus"))
+# XGBoost would otherwise start one thread per CPU in every worker
+os.environ.setdefault("OMP_NUM_THREADS", str(max(1, multiprocessing.cpu_count() // workers)))
+
+
+def on_starting(server):
+    os.makedirs(os.environ["WORKER_STATUS_DIR"], exist_ok=True)
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+    # Status and metric files of a previous run
+    for path in glob.glob(os.path.join(os.environ["WORKER_STATUS_DIR"], "*.json")) + \
+            glob.glob(os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], "*.db")):
+        os.remove(path)
+
+
+def child_exit(server, worker):
+    # Also covers workers killed after a timeout, which cannot clean up themselves
+    path = os.path.join(os.environ["WORKER_STATUS_DIR"], f"{worker.pid}.json")
+    if os.path.exists(path):
+        os.remove(path)
+    # Imported here, not at the top: prometheus_client picks its multiprocess
+    # storage at import time, after PROMETHEUS_MULTIPROC_DIR is set above
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,85 @@
+import os
+import numpy as np
+import pandas as pd
+from io_formats import save_snapshot, read_arrow_table, snapshot_metadata
+
+
+def hash_ids(ids):
+    # categorize only pays off for repeated values; IDs are mostly unique
+    return pd.util.hash_array(np.asarray(ids, dtype=object), categorize=False)
+
+
+def index_path(path):
+    """
+        Where the index of the Arrow file at `path` is saved.
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}.index{ext}"
+
+
+class IdIndex:
+    """
+        Customer_ID -> row positions as two arrays ordered by a 64-bit hash
+        of the ID. Unlike a dict it can be saved as an Arrow file and
+        memory-mapped, so every worker on a host reads the same pages.
+        Hash matches are checked against `ids`, so collisions only cost a
+        comparison.
+    """
+
+    def __init__(self, hashes, rows, ids):
+        self.hashes = hashes
+        self.rows = rows
+        self.ids = ids
+
+    @classmethod
+    def build(cls, ids):
+        hashes = hash_ids(ids)
+        # Stable, so the rows of one ID stay in file order
+        rows = np.argsort(hashes, kind="stable")
+        return cls(hashes[rows], rows, ids)
+
+    def get(self, customer_id):
+        """
+            Row positions of `customer_id` in file order, or None.
+        """
+        key = hash_ids([customer_id])[0]
+        lo, hi = np.searchsorted(self.hashes, key), np.searchsorted(self.hashes, key, side="right")
+        rows = [row for row in self.rows[lo:hi] if self.ids[row] == customer_id]
+        return np.array(rows) if rows else None
+
+    def get_many(self, customer_ids):
+        """
+            First row position of each of `customer_ids` (-1 if unknown),
+            with one hash and one searchsorted over the whole list.
+        """
+        customer_ids = np.asarray(customer_ids, dtype=object)
+        if len(self.hashes) == 0 or len(customer_ids) == 0:
+            return np.full(len(customer_ids), -1, dtype=np.int64)
+        keys = hash_ids(customer_ids)
+        slots = np.minimum(np.searchsorted(self.hashes, keys), len(self.hashes) - 1)
+        rows = np.where(self.hashes[slots] == keys, self.rows[slots], -1).astype(np.int64)
+
+        # The first row with a matching hash belongs to another ID only on a
+        # collision; those few go through get()
+        hits = np.flatnonzero(rows >= 0)
+        matched = np.asarray(self.ids.take(rows[hits]), dtype=object) == customer_ids[hits]
+        for i in hits[~matched]:
+            positions = self.get(customer_ids[i])
+            rows[i] = -1 if positions is None else positions[0]
+        return rows
+
+    def save(self, path, version):
+        save_snapshot(pd.DataFrame({"hash": self.hashes, "row": self.rows}), path, {"version": version})
+
+    @classmethod
+    def load(cls, path, ids, version):
+        """
+            The memory-mapped index at `path` if it was built for `version`,
+            else None.
+        """
+        if not os.path.exists(path):
+            return None
+        table = read_arrow_table(path)
+        if snapshot_metadata(table).get("version") != version or table.num_rows != len(ids):
+            return None
+        return cls(table.column("hash").to_numpy(), table.column("row").to_numpy(), ids)
@@ -0,0 +1,300 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
+from scripts.feature_constants import RAW_FEATURE_COLUMNS, CATEGORY_VALUES, INTEGER_DTYPES
+
+# Customer_ID plus the raw feature columns; anything else in an upload is not read
+INPUT_COLUMNS = ['Customer_ID'] + RAW_FEATURE_COLUMNS
+
+# Read categorical fields as categoricals and integer fields as the smallest
+# integer dtype that holds them, instead of object strings and int64
+LOW_MEMORY_FRAMES = os.environ.get("LOW_MEMORY_FRAMES", "1") == "1"
+# Rows parsed at a time when a whole CSV is read in low-memory mode
+CSV_READ_CHUNK_ROWS = 100000
+
+FORMAT_EXTENSIONS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+}
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+OUTPUT_EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+
+
+def format_from_name(file_name):
+    """
+        Input format for a file name, or None if the extension is unsupported.
+    """
+    return FORMAT_EXTENSIONS.get(os.path.splitext(file_name)[1].lower())
+
+
+def output_name(file_name, fmt):
+    """
+        `file_name` with its extension replaced by the one for `fmt`.
+    """
+    return os.path.splitext(file_name)[0] + OUTPUT_EXTENSIONS[fmt]
+
+
+def compact_frame(df):
+    """
+        Shrink a freshly read frame in place: categorical fields become
+        categoricals over CATEGORY_VALUES (unknown values are appended to
+        the categories, not lost) and integer fields get their
+        INTEGER_DTYPES type.
+    """
+    if not LOW_MEMORY_FRAMES:
+        return df
+    for col, known in CATEGORY_VALUES.items():
+        if col not in df.columns:
+            continue
+        values = df[col] if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].astype("category")
+        extra = values.cat.categories.difference(known, sort=False)
+        df[col] = values.cat.set_categories(known + extra.tolist())
+    for col, dtype in INTEGER_DTYPES.items():
+        if col not in df.columns or df[col].dtype.kind != "i" or df[col].empty:
+            continue
+        limits = np.iinfo(dtype)
+        if limits.min <= df[col].min() and df[col].max() <= limits.max:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def _csv_dtypes():
+    # Parsed straight into categoricals, so no per-row string objects are kept
+    return {col: "category" for col in CATEGORY_VALUES} if LOW_MEMORY_FRAMES else None
+
+
+def _to_pandas(table):
+    """
+        DataFrame from an Arrow table, with the categorical fields converted
+        from dictionary arrays rather than per-row Python strings.
+    """
+    if LOW_MEMORY_FRAMES:
+        for i, field in enumerate(table.schema):
+            if field.name in CATEGORY_VALUES and (pa.types.is_string(field.type) or pa.types.is_large_string(field.type)):
+                table = table.set_column(i, field.name, table.column(i).dictionary_encode())
+    return compact_frame(table.to_pandas())
+
+
+def arrow_frame(table):
+    """
+        DataFrame over the buffers of an Arrow table, for memory-mapped
+        snapshots shared by several processes: single-chunk numeric and
+        dictionary columns are wrapped without copying and strings stay
+        pyarrow-backed. Other columns are converted as usual.
+    """
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        chunk = column.chunk(0) if column.num_chunks == 1 else None
+        if chunk is not None and chunk.null_count == 0 and pa.types.is_dictionary(chunk.type):
+            columns[name] = pd.Categorical.from_codes(chunk.indices.to_numpy(zero_copy_only=True),
+                                                      categories=chunk.dictionary.to_pandas())
+        elif chunk is not None and chunk.null_count == 0 and (pa.types.is_integer(chunk.type)
+                                                              or pa.types.is_floating(chunk.type)):
+            columns[name] = chunk.to_numpy(zero_copy_only=True)
+        elif pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+            columns[name] = pd.arrays.ArrowStringArray(column)
+        else:
+            columns[name] = column.to_pandas()
+    return pd.DataFrame(columns, copy=False)
+
+
+def _projection(available, columns):
+    if columns is None:
+        return None
+    return [col for col in columns if col in available]
+
+
+def iter_chunks(source, fmt, chunk_rows, columns=INPUT_COLUMNS):
+    """
+        Yield DataFrames of at most `chunk_rows` rows from a CSV, Parquet or
+        Arrow IPC source (path or binary file object). Only `columns` that
+        exist in the source are read.
+    """
+    if fmt == "csv":
+        usecols = None if columns is None else (lambda col: col in columns)
+        for chunk in pd.read_csv(source, chunksize=chunk_rows, usecols=usecols, dtype=_csv_dtypes()):
+            yield compact_frame(chunk)
+
+    elif fmt == "parquet":
+        parquet_file = pq.ParquetFile(source)
+        projection = _projection(parquet_file.schema_arrow.names, columns)
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=projection):
+            yield _to_pandas(pa.Table.from_batches([batch]))
+
+    elif fmt == "arrow":
+        table = read_arrow_table(source)
+        projection = _projection(table.column_names, columns)
+        if projection is not None:
+            table = table.select(projection)
+        for batch in table.to_batches(max_chunksize=chunk_rows):
+            yield _to_pandas(pa.Table.from_batches([batch]))
+
+    else:
+        raise ValueError(f"Unsupported input format: {fmt}")
+
+
+def read_arrow_table(source):
+    """
+        Read an Arrow IPC file (memory-mapped when given a path) or stream.
+    """
+    if isinstance(source, str):
+        source = pa.memory_map(source, "r")
+    try:
+        return pa.ipc.open_file(source).read_all()
+    except pa.ArrowInvalid:
+        source.seek(0)
+        return pa.ipc.open_stream(source).read_all()
+
+
+def read_frame(source, fmt, columns=INPUT_COLUMNS):
+    """
+        Read a whole CSV, Parquet or Arrow IPC source into one DataFrame.
+    """
+    if fmt == "csv":
+        usecols = None if columns is None else (lambda col: col in columns)
+        if LOW_MEMORY_FRAMES:
+            # Parsed in chunks: categoricals over the same known values concatenate
+            # as codes, so the parser's buffers never hold the whole file
+            return pd.concat(iter_chunks(source, fmt, CSV_READ_CHUNK_ROWS, columns), ignore_index=True)
+        return pd.read_csv(source, usecols=usecols)
+    if fmt == "parquet":
+        names = pq.ParquetFile(source).schema_arrow.names
+        projection = _projection(names, columns)
+        if hasattr(source, "seek"):
+            source.seek(0)
+        dictionary = [col for col in CATEGORY_VALUES if col in names] if LOW_MEMORY_FRAMES else None
+        return _to_pandas(pq.read_table(source, columns=projection, read_dictionary=dictionary))
+    if fmt == "arrow":
+        table = read_arrow_table(source)
+        projection = _projection(table.column_names, columns)
+        return _to_pandas(table.select(projection) if projection is not None else table)
+    raise ValueError(f"Unsupported input format: {fmt}")
+
+
+class ResultWriter:
+    """
+        Incremental writer for scored chunks in CSV, Parquet or Arrow IPC
+        format. Later chunks are cast to the schema of the first one, with
+        signed integer columns widened to int64 so a chunk with larger values than
+        the first still fits. Arrow IPC files allow one dictionary per
+        field, and a chunk may bring new categories, so categoricals are
+        written there as plain strings.
+    """
+
+    def __init__(self, path, fmt):
+        if fmt not in OUTPUT_EXTENSIONS:
+            raise ValueError(f"Unsupported output format: {fmt}")
+        self.path = path
+        self.fmt = fmt
+        self._file = None
+        self._writer = None
+        self._schema = None
+        self._closed = False
+
+    @property
+    def content_type(self):
+        return CONTENT_TYPES[self.fmt]
+
+    def write(self, df):
+        if self.fmt == "csv":
+            first = self._file is None
+            if first:
+                self._file = open(self.path, "w", newline="")
+            df.to_csv(self._file, index=False, header=first)
+            return
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            self._schema = pa.schema([self._output_field(field) for field in table.schema],
+                                     metadata=table.schema.metadata)
+            table = table.cast(self._schema)
+            if self.fmt == "parquet":
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            else:
+                self._writer = pa.ipc.new_file(self.path, self._schema)
+        else:
+            table = table.cast(self._schema)
+        self._writer.write_table(table)
+
+    def _output_field(self, field):
+        if pa.types.is_signed_integer(field.type):
+            return field.with_type(pa.int64())
+        if self.fmt == "arrow" and pa.types.is_dictionary(field.type):
+            return field.with_type(field.type.value_type)
+        return field
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._file is not None:
+            self._file.close()
+        elif self._writer is not None:
+            self._writer.close()
+        elif self.fmt == "csv":
+            open(self.path, "w").close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_frame(df, path, fmt):
+    """
+        Write a whole DataFrame as CSV, Parquet or Arrow IPC.
+    """
+    with ResultWriter(path, fmt) as writer:
+        writer.write(df)
+
+
+def save_snapshot(df, path, metadata):
+    """
+        Persist a DataFrame as Parquet or Arrow IPC (by extension) with string
+        metadata attached to the schema.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), **{
+        key.encode(): value.encode() for key, value in metadata.items()
+    }})
+    tmp_path = f"{path}.tmp"
+    if format_from_name(path) == "parquet":
+        pq.write_table(table, tmp_path)
+    else:
+        with pa.ipc.new_file(tmp_path, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path):
+    """
+        Load a snapshot written by save_snapshot. Arrow files are memory-mapped.
+        Returns (DataFrame, metadata).
+    """
+    if format_from_name(path) == "parquet":
+        table = pq.read_table(path)
+    else:
+        table = read_arrow_table(path)
+    return _to_pandas(table), snapshot_metadata(table)
+
+
+def snapshot_metadata(table):
+    """
+        The metadata save_snapshot attached to a table, as strings.
+    """
+    return {key.decode(): value.decode() for key, value in (table.schema.metadata or {}).items()
+            if key != b"pandas"}
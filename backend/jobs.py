@@ -0,0 +1,197 @@
+import contextlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from predict_with_file import score_stream, archive_input_and_result
+from labeling import DEFAULT_TIERS, Tiers, build_summary
+from io_formats import ResultWriter, format_from_name, CONTENT_TYPES, OUTPUT_EXTENSIONS
+
+# Number of batch jobs scored at the same time
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+# Where job inputs and results are kept until they expire
+JOB_DIR = os.environ.get("JOB_DIR", os.path.join(tempfile.gettempdir(), "cred-bounce-back-jobs"))
+# Finished jobs (and their files) are dropped after this many seconds
+JOB_TTL_SECONDS = float(os.environ.get("JOB_TTL_SECONDS", 24 * 60 * 60))
+
+# <job_id>.json, the state file of a job
+STATE_FILE = re.compile(r"([0-9a-f]{32})\.json")
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    def __init__(self, file_name, job_dir, output_format="csv", tiers=DEFAULT_TIERS):
+        self.id = uuid.uuid4().hex
+        self.file_name = file_name
+        self.input_format = format_from_name(file_name)
+        self.output_format = output_format
+        self.tiers = tiers
+        self.status = "queued"
+        self.rows_scored = 0
+        self.summary = None
+        self.result_key = None
+        self.model_version = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.input_path = os.path.join(job_dir, f"{self.id}.input{os.path.splitext(file_name)[1]}")
+        self.result_path = os.path.join(job_dir, f"{self.id}.result{OUTPUT_EXTENSIONS[output_format]}")
+
+    @property
+    def content_type(self):
+        return CONTENT_TYPES[self.output_format]
+
+    @staticmethod
+    def state_path(job_dir, job_id):
+        return os.path.join(job_dir, f"{job_id}.json")
+
+    def save(self, job_dir):
+        """
+            Write the job's state next to its files, so every worker process
+            can answer for it, not only the one scoring it.
+        """
+        state = {**self.to_dict(), "input_format": self.input_format, "created_at": self.created_at,
+                 "finished_at": self.finished_at, "input_path": self.input_path, "result_path": self.result_path}
+        path = self.state_path(job_dir, self.id)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, job_dir, job_id):
+        """
+            A job's last saved state, or None.
+        """
+        try:
+            with open(cls.state_path(job_dir, job_id)) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        job = cls.__new__(cls)
+        job.id = state["job_id"]
+        job.tiers = Tiers(state.pop("thresholds"))
+        for key, value in state.items():
+            if key != "job_id":
+                setattr(job, key, value)
+        return job
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "file_name": self.file_name,
+            "output_format": self.output_format,
+            "thresholds": self.tiers.thresholds,
+            "status": self.status,
+            "rows_scored": self.rows_scored,
+            "summary": self.summary,
+            "result_key": self.result_key,
+            "model_version": self.model_version,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+        In-process queue of batch scoring jobs. Uploads are saved to disk, the
+        caller gets a job ID right away, and a small worker pool scores the
+        files with the streaming scorer while reporting progress.
+    """
+
+    def __init__(self, registry, workers=JOB_WORKERS, job_dir=JOB_DIR, ttl=JOB_TTL_SECONDS):
+        # Each job is scored by the model version active when it starts
+        self.registry = registry
+        self.job_dir = job_dir
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        os.makedirs(job_dir, exist_ok=True)
+
+    def submit(self, fileobj, file_name, output_format="csv", tiers=DEFAULT_TIERS):
+        """
+            Save the upload and queue it for scoring. Blocking; call from a
+            worker thread.
+        """
+        self._purge_expired()
+
+        job = Job(file_name, self.job_dir, output_format, tiers)
+        with open(job.input_path, "wb") as f:
+            shutil.copyfileobj(fileobj, f)
+
+        with self._lock:
+            self._jobs[job.id] = job
+        job.save(self.job_dir)
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        """
+            The job, whichever worker process it was submitted to.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and re.fullmatch(r"[0-9a-f]{32}", job_id):
+            job = Job.load(self.job_dir, job_id)
+        if job is not None and self._expired(job, time.time()):
+            return None
+        return job
+
+    def _run(self, job):
+        job.status = "running"
+        job.save(self.job_dir)
+
+        def progress(rows_done):
+            job.rows_scored = rows_done
+            job.save(self.job_dir)
+
+        try:
+            with self.registry.use() as bundle, open(job.input_path, "rb") as source, \
+                    ResultWriter(job.result_path, job.output_format) as writer:
+                job.model_version = bundle.version
+                counts = score_stream(source, writer, bundle.model, bundle.plan, job.input_format,
+                                      progress=progress, scorer=bundle.file_scorer, tiers=job.tiers)
+            job.summary = build_summary(counts)
+
+            # Job files stay on disk for download until the job expires
+            job.result_key = archive_input_and_result(job.input_path, job.result_path, job.file_name,
+                                                      job.output_format, delete_input=False,
+                                                      delete_result=False)
+            job.status = "done"
+        except Exception as e:
+            logger.exception("Job %s failed", job.id)
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            job.save(self.job_dir)
+
+    def _expired(self, job, now):
+        return job.finished_at is not None and now - job.finished_at > self.ttl
+
+    def _purge_expired(self):
+        """
+            Delete expired jobs through their state files, so jobs of other
+            worker processes (or of ones that have since restarted) go too.
+        """
+        now = time.time()
+        for name in os.listdir(self.job_dir):
+            match = STATE_FILE.fullmatch(name)
+            job = match and Job.load(self.job_dir, match.group(1))
+            if not job or not self._expired(job, now):
+                continue
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            for path in (job.input_path, job.result_path, Job.state_path(self.job_dir, job.id)):
+                # Another worker may be purging the same job
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+# Lowest score for each tier
+THRESHOLDS = {
+    "Platinum": 0.8,
+    "Gold": 0.6,
+    "Silver": 0.4,
+    "Bronze": 0.2,
+    "Copper": 0
+}
+
+# Scores that are missing or below every threshold
+UNKNOWN = "Unknown"
+
+
+class Tiers:
+    """
+        Tier thresholds as sorted edges, so a whole score array is labeled
+        with one searchsorted and counted with one bincount.
+    """
+
+    def __init__(self, thresholds=THRESHOLDS):
+        ordered = sorted(thresholds.items(), key=lambda item: item[1])
+        self.thresholds = dict(thresholds)
+        self.edges = np.array([edge for _, edge in ordered], dtype=float)
+        # Code 0 is Unknown, code i the i-th tier from the bottom
+        self.categories = [UNKNOWN] + [name for name, _ in ordered]
+
+    def codes(self, scores):
+        scores = np.asarray(scores, dtype=float)
+        codes = np.searchsorted(self.edges, scores, side="right")
+        codes[np.isnan(scores)] = 0
+        return codes
+
+    def label(self, scores):
+        """
+            Return (labels as a pandas Categorical, {label: count}).
+        """
+        codes = self.codes(scores)
+        counts = np.bincount(codes, minlength=len(self.categories))
+        labels = pd.Categorical.from_codes(codes, categories=self.categories)
+        return labels, dict(zip(self.categories, counts.tolist()))
+
+    def name(self, score):
+        return self.categories[self.codes([score])[0]]
+
+
+DEFAULT_TIERS = Tiers()
+
+
+def build_summary(counts):
+    """
+        Response summary from a {label: count} mapping. Rows below every
+        threshold (possible when Copper is raised above 0) are counted as
+        unknown, so the total always covers every scored row.
+    """
+    num_platinum = int(counts.get('Platinum', 0))
+    num_gold = int(counts.get('Gold', 0))
+    num_silver = int(counts.get('Silver', 0))
+    num_bronze = int(counts.get('Bronze', 0))
+    num_copper = int(counts.get('Copper', 0))
+    num_unknown = int(counts.get(UNKNOWN, 0))
+    return {
+        "platinum_predictions": num_platinum,
+        "glod_predictions": num_gold,
+        "silver_predictions": num_silver,
+        "bronze_predictions": num_bronze,
+        "copper_predictions": num_copper,
+        "unknown_predictions": num_unknown,
+        "total_predictions": int(sum(counts.values()))
+    }
+
+
+def parse_thresholds(spec):
+    """
+        Tiers from a "Platinum=0.85,Gold=0.65" override of the default
+        thresholds. Raises ValueError if the result is not valid.
+    """
+    thresholds = dict(THRESHOLDS)
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = entry.partition("=")
+        name = name.strip().capitalize()
+        if name not in THRESHOLDS:
+            raise ValueError(f"Unknown tier {name!r}; tiers are {', '.join(THRESHOLDS)}.")
+        try:
+            thresholds[name] = float(value)
+        except ValueError:
+            raise ValueError(f"Threshold for {name} must be a number, got {value!r}.")
+        if not 0 <= thresholds[name] <= 1:
+            raise ValueError(f"Threshold for {name} must be between 0 and 1.")
+
+    # Tiers keep their order: Platinum above Gold above Silver ...
+    values = list(thresholds.values())
+    if any(higher <= lower for higher, lower in zip(values, values[1:])):
+        raise ValueError(f"Thresholds must decrease from {next(iter(THRESHOLDS))} to {list(THRESHOLDS)[-1]}.")
+    return Tiers(thresholds)
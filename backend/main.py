@@ -1,11 +1,35 @@
 
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from pydantic import BaseModel
+from typing import List
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse, Response, JSONResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
-from predict_with_file import predict_with_file
-from predict_with_id import predict_with_ID
-import joblib
+from predict_with_file import (predict_with_file, predict_with_file_streaming, stream_predictions, save_upload,
+                               archiver, remove_files)
+from predict_with_id import predict_with_ID_async, predict_with_IDs, customer_store
+from jobs import JobManager
+from concurrency import id_scoring_pool, file_scoring_pool
+from prediction_cache import make_prediction_cache
+from registry import ModelRegistry
+from labeling import DEFAULT_TIERS, parse_thresholds
+from explain import make_explainer
+from metrics import stage, stats_collector, latest_metrics, REQUEST_SECONDS
+from prometheus_client import CONTENT_TYPE_LATEST
+import logging
+from io_formats import format_from_name, output_name, OUTPUT_EXTENSIONS, CONTENT_TYPES
+from results import ResultStore
+from workers import WorkerStatus
+from serialization import columnar_json
+import os
+import threading
+import time
  
+# LOG_LEVEL=DEBUG shows per-request and per-stage detail
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"),
+                    format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger("main")
+
 app = FastAPI(title="Cred Bounce Back Prediction")
  
 # Add CORS middleware to allow requests from the React frontend
@@ -19,28 +43,181 @@ app.add_middleware(
  
 # Constants
 ENDPOINT_NAME =  "end-point-xg-boost-cred-clf-2025-03-17-16-41-46" 
+# Largest number of IDs accepted by POST /predict/bulk
+BULK_MAX_IDS = int(os.environ.get("BULK_MAX_IDS", 100000))
+# Load the model after the server starts listening (0: load before serving)
+WARMUP_IN_BACKGROUND = os.environ.get("WARMUP_IN_BACKGROUND", "1") == "1"
+
+# Scored results kept for paging (GET /results/{id})
+result_store = ResultStore()
+
+# Scores of recently seen upload rows (PREDICTION_CACHE_ROWS=0 disables)
+prediction_cache = make_prediction_cache()
+
+# Active model version; new versions are loaded and swapped in without a restart
+registry = ModelRegistry(prediction_cache)
+
+# Set by warm_up(); requests that need the model get a 503 until it is done
+job_manager = None
+warmup_status = {"ready": False, "error": None, "seconds": {}}
+
+# This process's health as seen by GET /workers (one entry per gunicorn worker)
+worker_status = WorkerStatus(lambda: {"ready": warmup_status["ready"], "error": warmup_status["error"],
+                                      "model_version": registry.version,
+                                      "customer_data_version": customer_store.version})
+
+
+def timed_stage(stage, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    warmup_status["seconds"][stage] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def load_customer_store():
+    # Warm the customer index so the first ID lookup does not pay the download
+    try:
+        customer_store.load()
+    except Exception as e:
+        logger.warning("Customer store not loaded at startup, will retry on first lookup: %s", e)
+
+
+def warm_up():
+    """
+        Load the model (including its warm-up prediction) and the customer
+        index, then start the background helpers.
+    """
+    global job_manager
+    start = time.perf_counter()
+    try:
+        timed_stage("model", registry.load_latest, True)
+        timed_stage("customer_store", load_customer_store)
+        # Background scoring of large uploads (POST /jobs)
+        job_manager = JobManager(registry)
+        registry.start_watching()
+    except Exception as e:
+        warmup_status["error"] = str(e)
+        logger.exception("Warm-up failed")
+        raise
 
+    warmup_status["seconds"]["total"] = round(time.perf_counter() - start, 3)
+    warmup_status["ready"] = True
+    logger.info("Server ready (model %s) after %ss", registry.version, warmup_status["seconds"]["total"])
 
-preprocessor = joblib.load('preprocessor.pkl')
-print("Preprocessor Object is Loaded")
 
-model = joblib.load('model2.pkl')
+def require_ready():
+    if not warmup_status["ready"]:
+        raise HTTPException(
+            status_code=503,
+            detail="Model is still loading, retry shortly.",
+            headers={"Retry-After": "1"}
+        )
+
+
+@app.on_event("startup")
+def start_warm_up():
+    if WARMUP_IN_BACKGROUND:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    else:
+        warm_up()
+
+
+@app.on_event("startup")
+async def start_heartbeat():
+    worker_status.start()
+
 
-print("Server started")
+@app.on_event("shutdown")
+def stop_job_workers():
+    worker_status.stop()
+    if job_manager is not None:
+        job_manager.shutdown()
+    registry.stop()
+    archiver.stop()
+    id_scoring_pool.shutdown()
+    file_scoring_pool.shutdown()
 
 
 
  
+def check_file_formats(file, output_format):
+    if format_from_name(file.filename) is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Only CSV, Parquet and Arrow files are supported."
+        )
+    if output_format not in OUTPUT_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"output_format must be one of {', '.join(OUTPUT_EXTENSIONS)}."
+        )
+
+
+RESPONSE_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "columnar": "application/json",
+}
+
+
+def save_upload_file(file):
+    file.file.seek(0)
+    return save_upload(file.file)
+
+
+def tiers_or_400(thresholds):
+    """
+        Tiers for a "Platinum=0.85,Gold=0.65" thresholds parameter (defaults
+        for the tiers not given).
+    """
+    if not thresholds:
+        return DEFAULT_TIERS
+    try:
+        return parse_thresholds(thresholds)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def versioned(response, bundle):
+    """
+        Tag a response with the model version that produced it.
+    """
+    response.headers["X-Model-Version"] = bundle.version
+    return response
+
+
+def release_after(bundle, chunks):
+    # Streamed responses hold the model until the last chunk is sent
+    try:
+        yield from chunks
+    finally:
+        registry.release(bundle)
+
+
 @app.post("/predict")
-async def predict(file: UploadFile = File(None), customerID: str = None):
+async def predict(file: UploadFile = File(None), customerID: str = None, stream: bool = False,
+                  output_format: str = "csv", response_format: str = "records", thresholds: str = None,
+                  explain: int = 0):
     """
-    Endpoint to process CSV files and return predictions.
-    Either a CSV file or a customerID must be provided.
+    Endpoint to process CSV, Parquet or Arrow IPC files and return predictions.
+    Either a file or a customerID must be provided.
+    output_format (csv, parquet or arrow) selects the format of the
+    archived result file. response_format selects the file response:
+    - records: every row as a JSON object plus the summary (default)
+    - ndjson / columnar: predictions streamed chunk by chunk as they are scored
+    - summary: tier counts and a results_url to page through the result
+    stream=true is the same as response_format=summary.
+    thresholds overrides tier cut-offs for this request, e.g.
+    "Platinum=0.85,Gold=0.65".
+    explain=k adds each row's k largest feature contributions (log-odds,
+    per raw input column): Top1_Feature / Top1_Contribution ... columns for
+    files, an "explanation" list for a customerID.
     """
+    require_ready()
+    tiers = tiers_or_400(thresholds)
+    if explain < 0:
+        raise HTTPException(status_code=400, detail="explain must be the number of contributions to return.")
     # Check if neither parameter is provided
-    print("Called")
     if file is None and customerID is None:
-        print("No File and CustomerID")
         raise HTTPException(
             status_code=400,
             detail="Either a file or customerID must be provided."
@@ -48,22 +225,266 @@ async def predict(file: UploadFile = File(None), customerID: str = None):
    
     # If customerID is provided, use ID-based prediction
     if customerID is not None:
-        print("Into the CustomerID")
-        response = predict_with_ID(customerID, model, preprocessor) #ENDPOINT_NAME)
-        print(response)
-        print("\n\n===============\n", type(response))
-        return response
+        logger.debug("Scoring customer %s", customerID)
+        # Counted against ID_SCORING_MAX_PENDING while waiting for its batch too
+        with registry.use() as bundle, id_scoring_pool.admit():
+            response = await predict_with_ID_async(customerID, bundle.model, bundle.plan, id_scoring_pool.call,
+                                                   bundle.score_table, bundle.version, bundle.id_batcher,
+                                                   tiers, make_explainer(bundle.model, bundle.plan, explain))
+        logger.debug("Customer response: %s", response)
+        response["model_version"] = bundle.version
+        with stage("serialize"):
+            return versioned(ORJSONResponse(response), bundle)
    
     # At this point, we know file is not None
-    if not file.filename.endswith('.csv'):
-        print("Into CSV File")
+    check_file_formats(file, output_format)
+    if response_format not in ("records", "summary", *RESPONSE_FORMATS):
         raise HTTPException(
             status_code=400,
-            detail="Only CSV files are supported."
+            detail=f"response_format must be one of records, summary, {', '.join(RESPONSE_FORMATS)}."
         )
    
-    reponse = await predict_with_file(file, model, preprocessor)#ENDPOINT_NAME)
-    return reponse
+    if response_format in RESPONSE_FORMATS:
+        # The upload is closed with the request; stream from a saved copy
+        input_path = await file_scoring_pool.run(save_upload_file, file)
+        bundle = registry.acquire()
+        try:
+            # Scores the first chunk, so bad input is a 500 here rather than a truncated 200
+            predictions = await file_scoring_pool.run(stream_predictions, input_path, file.filename, bundle.model,
+                                                      bundle.plan, response_format, bundle.file_scorer,
+                                                      output_format, tiers,
+                                                      make_explainer(bundle.model, bundle.plan, explain))
+        except BaseException:
+            registry.release(bundle)
+            remove_files(input_path)
+            raise
+        return versioned(StreamingResponse(release_after(bundle, predictions),
+                                           media_type=RESPONSE_FORMATS[response_format]), bundle)
+
+    with registry.use() as bundle:
+        if stream or response_format == "summary":
+            reponse = await file_scoring_pool.run(predict_with_file_streaming, file, bundle.model, bundle.plan,
+                                                  bundle.file_scorer, output_format, result_store, tiers,
+                                                  make_explainer(bundle.model, bundle.plan, explain))
+        else:
+            reponse = await file_scoring_pool.run(predict_with_file, file, bundle.model, bundle.plan,
+                                                  bundle.file_scorer, output_format, tiers,
+                                                  make_explainer(bundle.model, bundle.plan, explain))#ENDPOINT_NAME)
+    reponse["model_version"] = bundle.version
+    # orjson, skipping FastAPI's jsonable_encoder walk over every record
+    with stage("serialize") as timer:
+        json_response = ORJSONResponse(reponse)
+        timer.bytes = len(json_response.body)
+    return versioned(json_response, bundle)
  
+
+class BulkPredictRequest(BaseModel):
+    customer_ids: List[str]
+
+
+@app.post("/predict/bulk")
+async def predict_bulk(request: BulkPredictRequest, thresholds: str = None):
+    """
+    Score a list of known customer IDs in one request. Unknown IDs are
+    listed under not_found instead of failing the request.
+    """
+    require_ready()
+    tiers = tiers_or_400(thresholds)
+    if not request.customer_ids:
+        raise HTTPException(status_code=400, detail="customer_ids must not be empty.")
+    if len(request.customer_ids) > BULK_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BULK_MAX_IDS} customer IDs per request."
+        )
+
+    with registry.use() as bundle:
+        response = await file_scoring_pool.run(predict_with_IDs, request.customer_ids, bundle.model, bundle.plan,
+                                               bundle.score_table, bundle.version, tiers)
+    response["model_version"] = bundle.version
+    with stage("serialize") as timer:
+        json_response = ORJSONResponse(response)
+        timer.bytes = len(json_response.body)
+    return versioned(json_response, bundle)
+ 
+
+@app.post("/jobs", status_code=202)
+async def submit_job(file: UploadFile = File(...), output_format: str = "csv", thresholds: str = None):
+    """
+    Queue a CSV, Parquet or Arrow file for background scoring and return
+    its job ID. Poll GET /jobs/{job_id} for progress and download the
+    result from GET /jobs/{job_id}/result once it is done.
+    """
+    require_ready()
+    tiers = tiers_or_400(thresholds)
+    check_file_formats(file, output_format)
+
+    job = await run_in_threadpool(job_manager.submit, file.file, file.filename, output_format, tiers)
+    return job.to_dict()
+
+
+def get_job_or_404(job_id):
+    require_ready()
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    return job
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    return get_job_or_404(job_id).to_dict()
+
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    job = get_job_or_404(job_id)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job.status}.")
+    return FileResponse(job.result_path, media_type=job.content_type,
+                        filename=f"result_{output_name(job.file_name, job.output_format)}")
+
+
+@app.get("/stats/id-batching")
+async def id_batching_stats():
+    """
+    Batch fill and queueing delay of the customerID micro-batcher.
+    """
+    require_ready()
+    id_batcher = registry.active.id_batcher
+    if id_batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, "window_ms": id_batcher.window * 1000, "max_rows": id_batcher.max_rows,
+            **id_batcher.stats.to_dict()}
+
+
+@app.get("/stats/prediction-cache")
+async def prediction_cache_stats():
+    """
+    Hit rate and size of the upload prediction cache.
+    """
+    if prediction_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, "model_version": registry.version, **prediction_cache.stats()}
+
+
+@app.get("/stats/shadow")
+async def shadow_stats():
+    """
+    Tier agreement and score differences of the shadow models against the
+    primary model.
+    """
+    require_ready()
+    bundle = registry.active
+    if bundle.shadow is None:
+        return {"enabled": False}
+    return {"enabled": True, "model_version": bundle.version, **bundle.shadow.to_dict()}
+
+
+def get_result_or_404(result_id):
+    result = result_store.get(result_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Result {result_id} not found or expired.")
+    return result
+
+
+@app.get("/results/{result_id}")
+async def result_page(result_id: str, offset: int = 0, limit: int = 100):
+    """
+    One page of a stored result as columnar JSON.
+    """
+    result = get_result_or_404(result_id)
+    page = await run_in_threadpool(result_store.page, result, max(offset, 0), limit)
+    content = columnar_json(page, result_id=result.id, offset=max(offset, 0), rows=len(page),
+                            total=result.total_rows)
+    return Response(content=content, media_type="application/json")
+
+
+@app.get("/results/{result_id}/download")
+async def result_download(result_id: str):
+    result = get_result_or_404(result_id)
+    return FileResponse(result.path, media_type=CONTENT_TYPES[result.fmt],
+                        filename=f"result_{output_name(result.file_name, result.fmt)}")
+
+
+@app.get("/model")
+async def model_info():
+    """
+    The model version serving new requests.
+    """
+    require_ready()
+    bundle = registry.active
+    return {"model_version": bundle.version, "model_path": bundle.paths[0],
+            "preprocessor_path": bundle.paths[1], "loaded_at": bundle.loaded_at}
+
+
+@app.post("/model/reload")
+async def reload_model():
+    """
+    Look for new artifacts now instead of waiting for the next poll. The
+    new version is loaded and warmed before it is swapped in. A rewritten
+    score table is picked up as well. Under gunicorn only the worker answering reloads now; the others pick the
+    version up on their next poll.
+    """
+    require_ready()
+    try:
+        swapped = await run_in_threadpool(registry.load_latest)
+        await run_in_threadpool(registry.refresh_score_table)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Model reload failed, keeping {registry.version}: {e}")
+    return {"reloaded": swapped, "model_version": registry.version}
+
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    REQUEST_SECONDS.labels(request.method, route.path if route is not None else "unmatched",
+                           response.status_code).observe(time.perf_counter() - start)
+    return response
+
+
+# The /stats endpoints, exported as gauges on /metrics
+stats_collector.add("prediction_cache", lambda: prediction_cache.stats() if prediction_cache is not None else {})
+stats_collector.add("id_batching", lambda: registry.active.id_batcher.stats.to_dict())
+stats_collector.add("shadow", lambda: registry.active.shadow.to_dict(), label_keys={"models": "model"})
+stats_collector.add("archiver", lambda: {"pending": archiver.pending, "failed": len(archiver.failed)})
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus metrics: per-stage latency histograms, rows and bytes per
+    stage, HTTP latency and the /stats counters. Under gunicorn the
+    histograms and counters are summed over all workers; the /stats gauges
+    are those of the answering worker, labeled with its pid.
+    """
+    return Response(latest_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: 200 once the model is loaded and a warm-up
+    prediction has run, 503 before that.
+    """
+    content = {"model_version": registry.version, "pid": worker_status.pid, **warmup_status}
+    return JSONResponse(content, status_code=200 if warmup_status["ready"] else 503)
+
+
+@app.get("/workers")
+async def workers():
+    """
+    Health of every worker process on this host (see gunicorn.conf.py):
+    200 when all of them are ready and heartbeating, 503 otherwise.
+    """
+    statuses = await run_in_threadpool(worker_status.workers)
+    healthy = bool(statuses) and all(status["healthy"] for status in statuses)
+    return JSONResponse({"workers": statuses, "healthy": sum(status["healthy"] for status in statuses)},
+                        status_code=200 if healthy else 503)
+
+
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
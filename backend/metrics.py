@@ -0,0 +1,126 @@
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from prometheus_client import Counter, Histogram, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+# Set by gunicorn.conf.py: every worker writes its counters and histograms
+# here, so a scrape answered by any worker reports totals over all of them
+PROMETHEUS_MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+logger = logging.getLogger(__name__)
+
+# Characters not allowed in a Prometheus metric name
+INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_]")
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+STAGE_SECONDS = Histogram("cbb_stage_seconds", "Time spent in each scoring stage", ["stage"],
+                          buckets=STAGE_BUCKETS)
+STAGE_ROWS = Counter("cbb_stage_rows", "Rows handled by each scoring stage", ["stage"])
+STAGE_BYTES = Counter("cbb_stage_bytes", "Bytes read or written by each scoring stage", ["stage"])
+REQUEST_SECONDS = Histogram("cbb_http_request_seconds", "Time to the start of the HTTP response",
+                            ["method", "route", "status"], buckets=STAGE_BUCKETS)
+
+
+class StageTimer:
+    def __init__(self, rows=None, nbytes=None):
+        self.rows = rows
+        self.bytes = nbytes
+
+
+@contextmanager
+def stage(name, rows=None, nbytes=None):
+    """
+        Time a block as `name` in cbb_stage_seconds. Row and byte counts can
+        be passed in or set on the yielded timer once they are known.
+    """
+    timer = StageTimer(rows, nbytes)
+    start = time.perf_counter()
+    try:
+        yield timer
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(name).observe(elapsed)
+        if timer.rows:
+            STAGE_ROWS.labels(name).inc(timer.rows)
+        if timer.bytes:
+            STAGE_BYTES.labels(name).inc(timer.bytes)
+        logger.debug("%s took %.4fs (rows=%s, bytes=%s)", name, elapsed, timer.rows, timer.bytes)
+
+
+def _flatten(stats, prefix, labels=(), label_keys=None):
+    label_keys = label_keys or {}
+    for key, value in stats.items():
+        if key in label_keys and isinstance(value, dict):
+            # {label value: stats}, e.g. per shadow model: the keys are data,
+            # so they go into a label rather than the metric name
+            label = label_keys[key]
+            for label_value, entry in value.items():
+                yield from _flatten(entry, f"{prefix}_{label}", (*labels, (label, str(label_value))), label_keys)
+            continue
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            yield from _flatten(value, name, labels, label_keys)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield name, labels, value
+
+
+class StatsCollector:
+    """
+        Exports the numeric fields of stats dicts (as served under /stats)
+        as gauges, read at scrape time. The stats belong to the process that
+        answers the scrape, so every gauge carries its pid.
+    """
+
+    def __init__(self):
+        self._sources = {}
+        self.pid = str(os.getpid())
+
+    def add(self, prefix, stats_fn, label_keys=None):
+        """
+            Export stats_fn() under cbb_<prefix>_*. label_keys maps a key
+            whose value is keyed by name (e.g. {"models": "model"}) to the
+            label those names are exported under.
+        """
+        self._sources[prefix] = (stats_fn, label_keys)
+
+    def collect(self):
+        for prefix, (stats_fn, label_keys) in self._sources.items():
+            try:
+                stats = stats_fn()
+            except Exception:
+                logger.debug("Stats for %s not available", prefix, exc_info=True)
+                continue
+            families = {}
+            for name, labels, value in _flatten(stats, f"cbb_{prefix}", label_keys=label_keys):
+                name = INVALID_NAME_CHARS.sub("_", name)
+                if name not in families:
+                    families[name] = GaugeMetricFamily(name, f"{prefix} statistic",
+                                                       labels=["pid", *(label for label, _ in labels)])
+                families[name].add_metric([self.pid, *(label_value for _, label_value in labels)], value)
+            yield from families.values()
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
+
+_scrape_registry = None
+
+
+def latest_metrics():
+    """
+        Exposition text for GET /metrics: the default registry in a single
+        process, or the counters and histograms of every worker from
+        PROMETHEUS_MULTIPROC_DIR plus this worker's stats gauges.
+    """
+    global _scrape_registry
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return generate_latest()
+    if _scrape_registry is None:
+        _scrape_registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(_scrape_registry)
+        _scrape_registry.register(stats_collector)
+    return generate_latest(_scrape_registry)
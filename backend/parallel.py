@@ -0,0 +1,69 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scoring import score_frame
+from artifacts import load_artifacts
+
+# Worker processes for scoring large uploads; 0 or 1 keeps scoring in-process
+SCORING_PROCESSES = int(os.environ.get("SCORING_PROCESSES", 0))
+# Inputs smaller than this are not worth shipping to other processes
+MIN_SHARD_ROWS = int(os.environ.get("SCORING_MIN_SHARD_ROWS", 5000))
+
+# Loaded once per worker process by _init_worker
+_worker_model = None
+_worker_plan = None
+
+
+def _init_worker(model_path, preprocessor_path):
+    global _worker_model, _worker_plan
+    _worker_model, _worker_plan, _ = load_artifacts(model_path, preprocessor_path)
+    # One XGBoost thread per process; the pool provides the parallelism
+    _worker_model.set_params(n_jobs=1)
+
+
+def _score_shard(shard):
+    return score_frame(shard, _worker_model, _worker_plan)
+
+
+class ParallelScorer:
+    """
+        Scores a DataFrame by splitting it into row shards and scoring them in
+        a pool of worker processes, each holding its own model and plan.
+        Scores come back in the original row order. Inputs too small for two
+        shards are scored in-process with `model` and `plan`.
+    """
+
+    def __init__(self, processes, model, plan, model_path, preprocessor_path, min_shard_rows=MIN_SHARD_ROWS):
+        self.processes = processes
+        self.model = model
+        self.plan = plan
+        self.min_shard_rows = min_shard_rows
+        self._pool = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_path, preprocessor_path),
+        )
+
+    def score(self, raw_data):
+        n_shards = min(self.processes, len(raw_data) // self.min_shard_rows)
+        if n_shards <= 1:
+            return score_frame(raw_data, self.model, self.plan)
+
+        bounds = np.linspace(0, len(raw_data), n_shards + 1, dtype=int)
+        shards = [raw_data.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+        return np.concatenate(list(self._pool.map(_score_shard, shards)))
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def make_parallel_scorer(model, plan, model_path, preprocessor_path, processes=SCORING_PROCESSES):
+    """
+        ParallelScorer if SCORING_PROCESSES asks for more than one process,
+        None (score in-process) otherwise.
+    """
+    if processes <= 1:
+        return None
+    return ParallelScorer(processes, model, plan, model_path, preprocessor_path)
@@ -1,77 +1,79 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
-import boto3
-import json
-import io
+from fastapi import UploadFile, HTTPException
+import logging
+import numpy as np
 # from scripts.preprocess import preprocess
 # from notebooks.preprocessing import apply_preprocessing
-from scripts.new_preprocessing import apply_preprocessing
+from scoring import score_frame
+from archival import Archiver, default_sink
+from serialization import ndjson_lines, columnar_json, json_line
+from io_formats import iter_chunks, read_frame, write_frame, ResultWriter, format_from_name, output_name, CONTENT_TYPES, OUTPUT_EXTENSIONS
+import itertools
 import tempfile
+import shutil
 import os
-import boto3
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-import pickle
-
-THRESHOLDS = {
-    "Platinum": 0.8,
-    "Gold": 0.6,
-    "Silver": 0.4,
-    "Bronze": 0.2,
-    "Copper": 0
-}
+from aws import s3_client
+from metrics import stage
+from labeling import DEFAULT_TIERS, build_summary
 
 BUCKET_NAME = "a-sample-bajaj-bucket"
 PREFIX = "sample-bajaj-local"
-s3_client = boto3.client("s3")
 
-def get_label(score):
-    for label, threshold in THRESHOLDS.items():
-        if score >= threshold:
-            return label
-    return "Unknown" 
+# Uploads inputs and results to S3 (or ARCHIVE_DIR) after the response is sent
+archiver = Archiver(default_sink(s3_client))
 
+# Rows per chunk when scoring uploads in streaming mode
+CHUNK_ROWS = int(os.environ.get("SCORING_CHUNK_ROWS", 50000))
 
-async def predict_with_file(file: UploadFile, model, preprocessor):#ENDPOINT_NAME):
+logger = logging.getLogger(__name__)
+
+def score_rows(raw_data, model, plan, scorer=None, explainer=None):
     """
-        Function to process a CSV file and return predictions.
+        Score raw rows in-process, or with `scorer` (prediction cache and/or
+        worker processes) when one is configured. Returns (scores, extra
+        result columns); with an explainer the rows are scored in-process
+        and the extra columns hold their top feature contributions.
     """
+    if explainer is not None:
+        scores, indices, values = explainer.score(raw_data)
+        return scores, explainer.columns(indices, values)
+    if scorer is not None:
+        return scorer.score(raw_data), {}
+    return score_frame(raw_data, model, plan), {}
+
+
+def upload_size(fileobj):
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    return size
+
 
-    # Save the uploaded file temporarily
-    temp_dir = tempfile.mkdtemp()
-    temp_file_path = os.path.join(temp_dir, file.filename)
+def predict_with_file(file: UploadFile, model, plan, scorer=None, output_format="csv", tiers=DEFAULT_TIERS,
+                      explainer=None):#ENDPOINT_NAME):
+    """
+        Function to process a CSV, Parquet or Arrow file and return predictions.
+        Blocking; run it off the event loop.
+    """
     file_name = file.filename
-   
-    with open(temp_file_path, "wb") as f:
-        f.write(await file.read())
-    
+
     try:
-        # Read and preprocess the data
-        raw_data = pd.read_csv(temp_file_path)
-        print("Raw Data")
+        # Read and preprocess the data straight from the spooled upload
+        input_format = format_from_name(file_name)
+        with stage("parse", nbytes=upload_size(file.file)) as timer:
+            raw_data = read_frame(file.file, input_format)
+            timer.rows = len(raw_data)
+        logger.debug("Read %d rows from %s", len(raw_data), file_name)
         # response = s3_client.get_object(
         #         Bucket = BUCKET_NAME,
         #         Key = F"{PREFIX}/packages/preprocessing_objects.pkl"
         #     )
         # preprocessing_objects_from_s3 = pickle.loads(response["Body"].read())
-        print("Preproccessing..")
         # preprocessed_data = preprocess(raw_data)
         # preprocessed_data = apply_preprocessing(raw_data, preprocessing_objects_from_s3)
 
-        # ===========================
-        preprocessed_data = apply_preprocessing(raw_data, preprocessor)
-        # ===========================
-
-        print(preprocessed_data.shape, preprocessed_data.columns)
-
-        print("Preproccesing done")
         # body = (preprocessed_data.iloc[:, 1:]).to_csv(index=False, header=False)
         # body = body.encode("utf-8")
 
-        
-        print("Involking")
         # # Make SageMaker inference call
         # sagemaker_runtime_client = boto3.client("runtime.sagemaker")
         # response = sagemaker_runtime_client.invoke_endpoint(
@@ -93,73 +95,234 @@ async def predict_with_file(file: UploadFile, model, preprocessor):#ENDPOINT_NAM
      
         # ==============
         # score for good 
-        for col in preprocessed_data.select_dtypes(include='object').columns:
-            preprocessed_data[col] = preprocessed_data[col].astype(float)
-
-        preprocessed_data.columns = preprocessed_data.columns.astype(str).str.replace(r'[^a-zA-Z0-9_]', '_', regex=True)
-        scores = model.predict_proba(preprocessed_data)[:, 1]
-        scores = [round(float(score), 3) for score in scores]
-        ID = list(range(1, len(scores) + 1))
+        scores, explanations = score_rows(raw_data, model, plan, scorer, explainer)
         # ==============
 
-
-        THRESHOLD = 0.5
-        dataset = pd.DataFrame({"ID": ID, "Score": scores})
-        dataset["Label"] = dataset["Score"].apply(get_label)
-     
-        # Combine with original data
-        result_dataset = pd.concat([raw_data, dataset], axis=1)
+        with stage("labeling", rows=len(scores)):
+            scores = np.round(scores.astype(float), 3)
+            labels, counts = tiers.label(scores)
+            # Added to the original data in place rather than concatenated into a copy
+            result_dataset = raw_data
+            result_dataset["ID"] = np.arange(1, len(scores) + 1)
+            result_dataset["Score"] = scores
+            result_dataset["Label"] = labels
+            for name, values in explanations.items():
+                result_dataset[name] = values
        
-        # Prepare the response
-        summary = dataset["Label"].value_counts().to_dict()
-        num_platinum = summary.get('Platinum', 0)
-        num_gold = summary.get('Gold', 0)
-        num_silver = summary.get('Silver', 0)
-        num_bronze = summary.get('Bronze', 0)
-        num_copper = summary.get('Copper', 0)
-
-
-        # Save the rawdata to S3
-        csv_buffer = io.StringIO()
-        raw_data.to_csv(csv_buffer, index=False, header=True)
-        input_Key = f'{PREFIX}/input/rawdata/{file_name}'
-        s3_client.put_object(
-            Bucket=BUCKET_NAME,
-            Key=input_Key,
-            Body=csv_buffer.getvalue(),
-            ContentType="text/csv"
-        )
-
-
-        # Save the result to S3
-        csv_buffer = io.StringIO()
-        result_dataset.to_csv(csv_buffer, index=False, header=True)
-        output_Key = f'{PREFIX}/output/result/{file_name}'
-        s3_client.put_object(
-            Bucket=BUCKET_NAME,
-            Key=output_Key,
-            Body=csv_buffer.getvalue(),
-            ContentType="text/csv"
-        )
+            # Prepare the response
+            summary = build_summary(counts)
 
+        # Queue the original upload and the result for archival in the background
+        with tempfile.NamedTemporaryFile(suffix=OUTPUT_EXTENSIONS[output_format], delete=False) as result_file:
+            pass
+        with stage("result_write", rows=len(result_dataset)) as timer:
+            write_frame(result_dataset, result_file.name, output_format)
+            timer.bytes = os.path.getsize(result_file.name)
+        file.file.seek(0)
+        archive_input_and_result(save_upload(file.file), result_file.name, file_name, output_format)
        
+        with stage("records", rows=len(result_dataset)):
+            predictions = result_dataset.to_dict(orient='records')
         return {
-            "predictions": result_dataset.to_dict(orient='records'),
-            "summary": {
-                "platinum_predictions": int(num_platinum),
-                "glod_predictions": int(num_gold),
-                "silver_predictions": int(num_silver),
-                "bronze_predictions": int(num_bronze),
-                "copper_predictions": int(num_copper),
-                "total_predictions": int(num_platinum + num_gold + num_silver + num_bronze + num_copper)
-            }
+            "predictions": predictions,
+            "summary": summary
         }
    
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
    
+
+
+def iter_scored_chunks(source, model, plan, input_format="csv", chunk_rows=CHUNK_ROWS, scorer=None,
+                       tiers=DEFAULT_TIERS, explainer=None):
+    """
+        Yield (chunk, label counts) for fixed-size chunks of a CSV, Parquet or
+        Arrow file, with the ID, Score and Label columns (and explanation
+        columns with an explainer) added. Only one chunk is in memory at a
+        time.
+    """
+    rows_done = 0
+    chunks = iter_chunks(source, input_format, chunk_rows)
+    while True:
+        with stage("parse") as timer:
+            chunk = next(chunks, None)
+            timer.rows = len(chunk) if chunk is not None else None
+        if chunk is None:
+            return
+
+        scores, explanations = score_rows(chunk, model, plan, scorer, explainer)
+        scores = scores.astype(float).round(3)
+        with stage("labeling", rows=len(chunk)):
+            chunk.reset_index(drop=True, inplace=True)
+            chunk["ID"] = np.arange(rows_done + 1, rows_done + len(chunk) + 1)
+            chunk["Score"] = scores
+            chunk["Label"], chunk_counts = tiers.label(scores)
+            for name, values in explanations.items():
+                chunk[name] = values
+        rows_done += len(chunk)
+        yield chunk, chunk_counts
+
+
+def add_label_counts(counts, chunk_counts):
+    for label, count in chunk_counts.items():
+        counts[label] = counts.get(label, 0) + count
+
+
+def score_stream(source, writer, model, plan, input_format="csv", chunk_rows=CHUNK_ROWS, progress=None,
+                 scorer=None, tiers=DEFAULT_TIERS, explainer=None):
+    """
+        Score a file chunk by chunk, handing each scored chunk to the
+        ResultWriter before the next one is read, so memory is bounded by
+        `chunk_rows`, not by the file size. Returns the label counts over the
+        whole file.
+    """
+    counts = {}
+    rows_done = 0
+    for chunk, chunk_counts in iter_scored_chunks(source, model, plan, input_format, chunk_rows, scorer, tiers,
+                                                  explainer):
+        add_label_counts(counts, chunk_counts)
+        with stage("result_write", rows=len(chunk)):
+            writer.write(chunk)
+        rows_done += len(chunk)
+        if progress is not None:
+            progress(rows_done)
+
+    return counts
+
+
+def save_upload(fileobj):
+    """
+        Copy the original upload bytes to a temporary file for archival.
+    """
+    with stage("upload_read") as timer, tempfile.NamedTemporaryFile(delete=False) as f:
+        shutil.copyfileobj(fileobj, f, 1024 * 1024)
+        timer.bytes = f.tell()
+    return f.name
+
+
+def archive_input_and_result(input_path, result_path, file_name, output_format="csv", delete_input=True,
+                             delete_result=True):
+    """
+        Queue the input and result files for background archival. Returns the
+        result key they will be stored under.
+    """
+    archiver.archive(input_path, f'{PREFIX}/input/rawdata/{file_name}',
+                     CONTENT_TYPES[format_from_name(file_name)], delete_after=delete_input)
+    return archiver.archive(result_path, f'{PREFIX}/output/result/{output_name(file_name, output_format)}',
+                            CONTENT_TYPES[output_format], delete_after=delete_result)
+
+
+def predict_with_file_streaming(file: UploadFile, model, plan, scorer=None, output_format="csv",
+                                result_store=None, tiers=DEFAULT_TIERS, explainer=None):
+    """
+        Streaming variant of predict_with_file for large uploads. The upload is
+        read and scored chunk by chunk, results go to a file that is uploaded
+        to S3, and only the summary and the result location are returned.
+        With a result_store the result file is also kept for paging
+        (results_url). Blocking; run it off the event loop.
+    """
+    file_name = file.filename
+    extension = OUTPUT_EXTENSIONS[output_format]
+    if result_store is not None:
+        result_path = result_store.new_path(extension)
+    else:
+        with tempfile.NamedTemporaryFile(suffix=extension, delete=False) as result_file:
+            result_path = result_file.name
+
+    try:
+        # UploadFile is already spooled to disk by the server; read it in place
+        file.file.seek(0)
+        with ResultWriter(result_path, output_format) as writer:
+            counts = score_stream(file.file, writer, model, plan, format_from_name(file_name),
+                                  scorer=scorer, tiers=tiers, explainer=explainer)
+
+        file.file.seek(0)
+        # The upload copy is only needed for archival; a stored result stays for paging
+        output_Key = archive_input_and_result(save_upload(file.file), result_path, file_name, output_format,
+                                              delete_result=result_store is None)
+        response = {
+            "result_key": output_Key,
+            "summary": build_summary(counts)
+        }
+
+        if result_store is not None:
+            summary = response["summary"]
+            result = result_store.register(result_path, output_format, summary["total_predictions"], file_name)
+            response["result_id"] = result.id
+            response["results_url"] = f"/results/{result.id}"
+        return response
+
+    except Exception as e:
+        os.remove(result_path)
+        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+
+
+def stream_predictions(input_path, file_name, model, plan, response_format, scorer=None,
+                       output_format="csv", tiers=DEFAULT_TIERS, explainer=None):
+    """
+        Streamed prediction response for a saved upload. The first chunk is
+        read and scored here, so bad input fails with an HTTPException
+        before any status is sent; the returned generator scores the rest
+        chunk by chunk and yields each chunk as soon as it is scored:
+
+        - ndjson: one JSON object per row, then a final {"summary": ...} line
+        - columnar: {"chunks": [{"columns": [...], "data": {...}}, ...], "summary": {...}}
+
+        The result is written and archived as it goes, like the streaming
+        mode. Blocking; run it off the event loop.
+    """
+    with tempfile.NamedTemporaryFile(suffix=OUTPUT_EXTENSIONS[output_format], delete=False) as result_file:
+        result_path = result_file.name
+
+    writer = ResultWriter(result_path, output_format)
+    chunks = iter_scored_chunks(input_path, model, plan, format_from_name(file_name), scorer=scorer, tiers=tiers,
+                                explainer=explainer)
+    try:
+        first = next(chunks, None)
+    except Exception as e:
+        writer.close()
+        remove_files(input_path, result_path)
+        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+    return _stream_body(first, chunks, writer, input_path, result_path, file_name, response_format,
+                        output_format)
+
+
+def _stream_body(first, chunks, writer, input_path, result_path, file_name, response_format, output_format):
+    archived = False
+    try:
+        counts = {}
+        if response_format == "columnar":
+            yield b'{"chunks":['
+
+        scored = itertools.chain([first], chunks) if first is not None else chunks
+        with writer:
+            for position, (chunk, chunk_counts) in enumerate(scored):
+                add_label_counts(counts, chunk_counts)
+                with stage("result_write", rows=len(chunk)):
+                    writer.write(chunk)
+                with stage("serialize", rows=len(chunk)) as timer:
+                    if response_format == "columnar":
+                        body = (b"," if position else b"") + columnar_json(chunk)
+                    else:
+                        body = ndjson_lines(chunk)
+                    timer.bytes = len(body)
+                yield body
+
+        output_Key = archive_input_and_result(input_path, result_path, file_name, output_format)
+        archived = True
+        summary = {"summary": build_summary(counts), "result_key": output_Key}
+        if response_format == "columnar":
+            yield b'],' + json_line(summary)[1:]
+        else:
+            yield json_line(summary)
     finally:
-        # Clean up temporary file
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
-        os.rmdir(temp_dir)
\ No newline at end of file
+        # Scoring failed part-way or the client went away: nothing was archived
+        if not archived:
+            writer.close()
+            remove_files(input_path, result_path)
+
+
+def remove_files(*paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
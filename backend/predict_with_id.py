@@ -1,87 +1,136 @@
-import pandas as pd
-import boto3
-import json
+import asyncio
+import logging
+import numpy as np
 # from notebooks.preprocessing import apply_preprocessing
 # from scripts.preprocess import preprocess
-from scripts.new_preprocessing import apply_preprocessing
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-import pickle
-
-s3_client = boto3.client("s3")
+from scoring import score_frame
+from customer_store import CustomerStore, default_source
+from fastapi import HTTPException
+from aws import s3_client
+from metrics import stage
+from labeling import DEFAULT_TIERS, build_summary
 
 BUCKET_NAME = "a-sample-bajaj-bucket"
 PREFIX = "sample-bajaj-local"
 
+customer_store = CustomerStore(default_source(s3_client))
+
+logger = logging.getLogger(__name__)
+
 
-def predict_with_ID(customerID , model, preprocessor):# ENDPOINT_NAME):
+def lookup_customer(customerID, score_table=None, model_version=None, explainer=None):
     """
-        Function to process a CSV file with Customer ID and return Category.
+        The customer's rows plus their score and explanation where they are
+        known without live scoring: from the precomputed score table when it
+        matches the current model and customer data, or from the explainer,
+        which scores together with the contributions. Otherwise the score is
+        None.
     """
-    print(f'{PREFIX}/raw/raw_data1.csv')
-    s3_response = s3_client.get_object(Bucket=BUCKET_NAME, Key=f'{PREFIX}/raw/raw_data1.csv')
-    print("Fetched from s3")
-
-    # Read CSV content into DataFrame
-    raw_data = pd.read_csv(s3_response['Body'])    
-    customer_values = raw_data[raw_data["Customer_ID"] == customerID]
-    print("Call preproessing - ", customer_values.shape)
-
-
-    # response = s3_client.get_object(
-    #             Bucket = BUCKET_NAME,
-    #             Key = F"{PREFIX}/packages/preprocessing_objects.pkl"
-    #         )
-    # preprocessing_objects_from_s3 = pickle.loads(response["Body"].read())
-
-    # preprocessed_data = preprocess(customer_values)
-    # print(type(preprocessing_objects_from_s3))
-    # print(preprocessing_objects_from_s3)
-    # print("Predictions: ", preprocessing_objects_from_s3["preprocessor"])
-    # preprocessed_data = apply_preprocessing(customer_values, preprocessing_objects_from_s3)
-
-    # ================================
-    preprocessed_data = apply_preprocessing(customer_values, preprocessor)
-    # ================================
-    print(preprocessed_data.shape, preprocessed_data.columns)
-
-    # body = (preprocessed_data.iloc[:, 1:]).to_csv(index=False, header=False)
-    # body = body.encode("utf-8")
-
-    print("Invoking")
-    # # Make SageMaker inference call
-    # sagemaker_runtime_client = boto3.client("runtime.sagemaker")
-    # response = sagemaker_runtime_client.invoke_endpoint(
-    #     EndpointName=  ENDPOINT_NAME,
-    #     ContentType="text/csv",
-    #     Body=body,
-    #     Accept="application/json"
-    # )
-
-    # # Process the response
-    # result = json.loads(response['Body'].read().decode('utf-8'))
-
-    # score = result["predictions"][0]['score']
-    # print(result, score)
-
-    # =================================
-    for col in preprocessed_data.select_dtypes(include='object').columns:
-        preprocessed_data[col] = preprocessed_data[col].astype(float)
-
-    preprocessed_data.columns = preprocessed_data.columns.astype(str).str.replace(r'[^a-zA-Z0-9_]', '_', regex=True)
-    score = model.predict_proba(preprocessed_data)[0][1]
-    # ================================
-
-    print("Returning Results from predict with ID fucntion")
-
-    return {
+    # Indexed lookup in the cached customer data (refetched only when it changes)
+    with stage("customer_lookup", rows=1):
+        customer_values = customer_store.lookup(customerID)
+    if customer_values is None:
+        raise HTTPException(status_code=404, detail=f"Customer {customerID} not found.")
+
+    score = None
+    explanation = None
+    if explainer is not None:
+        scores, indices, values = explainer.score(customer_values)
+        score = scores[0]
+        explanation = explainer.records(indices, values)
+    elif score_table is not None and score_table.is_current(model_version, customer_store.version):
+        score = score_table.get(customerID)
+    return customer_values, score, explanation
+
+
+def customer_response(customerID, customer_values, score, tiers=DEFAULT_TIERS, explanation=None):
+    score = round(float(score), 3)
+    response = {
         "customer_prediction": {
             "customer_ID": customerID,
             "data": customer_values.to_dict(orient='records'),
-            "score": round(float(score), 3)
+            "score": score,
+            "label": tiers.name(score)
         }
     }
+    if explanation is not None:
+        response["customer_prediction"]["explanation"] = explanation
+    return response
+
+
+def predict_with_ID(customerID , model, plan, score_table=None, model_version=None, batcher=None,
+                    tiers=DEFAULT_TIERS, explainer=None):# ENDPOINT_NAME):
+    """
+        Function to process a CSV file with Customer ID and return Category.
+        Scores are served from the precomputed score table when it matches the
+        current model and customer data; other IDs are scored live, through
+        `batcher` when one is given so concurrent lookups share one model call.
+        With an explainer the customer is scored live together with the top
+        feature contributions.
+    """
+    customer_values, score, explanation = lookup_customer(customerID, score_table, model_version, explainer)
+    if score is None:
+        logger.debug("Scoring %s rows for %s", customer_values.shape, customerID)
+        if batcher is not None:
+            score = batcher.score(customer_values)[0]
+        else:
+            score = score_frame(customer_values, model, plan)[0]
+    return customer_response(customerID, customer_values, score, tiers, explanation)
+
+
+async def predict_with_ID_async(customerID, model, plan, run, score_table=None, model_version=None, batcher=None,
+                                tiers=DEFAULT_TIERS, explainer=None):
+    """
+        predict_with_ID for async endpoints. Blocking steps go through
+        `run` (a thread pool), but a live score from the micro-batcher is
+        awaited on the event loop: a pool thread held per waiting request
+        would cap every batch at the pool size.
+    """
+    customer_values, score, explanation = await run(lookup_customer, customerID, score_table, model_version,
+                                                    explainer)
+    if score is None:
+        logger.debug("Scoring %s rows for %s", customer_values.shape, customerID)
+        if batcher is not None:
+            score = (await asyncio.wrap_future(batcher.submit(customer_values)))[0]
+        else:
+            score = (await run(score_frame, customer_values, model, plan))[0]
+    return customer_response(customerID, customer_values, score, tiers, explanation)
+
+
+def predict_with_IDs(customerIDs, model, plan, score_table=None, model_version=None, tiers=DEFAULT_TIERS):
+    """
+        Score many known customers at once. IDs are resolved against the
+        customer data in one indexed pass and all rows without a current
+        precomputed score go through a single preprocess + predict call.
+    """
+    # Drop repeated IDs, keeping request order
+    customerIDs = list(dict.fromkeys(customerIDs))
+    with stage("customer_lookup", rows=len(customerIDs)):
+        customer_values, found, not_found = customer_store.lookup_many(customerIDs)
+
+    scores = [None] * len(found)
+    if score_table is not None and score_table.is_current(model_version, customer_store.version):
+        scores = score_table.get_many(found)
+
+    missing = [idx for idx, score in enumerate(scores) if score is None]
+    if missing:
+        logger.debug("Scoring %d of %d customers live", len(missing), len(found))
+        live_scores = score_frame(customer_values.iloc[missing], model, plan)
+        for idx, score in zip(missing, live_scores):
+            scores[idx] = score
+
+    scores = np.round(np.array(scores, dtype=float), 3)
+    labels, counts = tiers.label(scores)
+    return {
+        "predictions": [
+            {"customer_ID": customer_id, "score": score, "label": label}
+            for customer_id, score, label in zip(found, scores.tolist(), labels.astype(str).tolist())
+        ],
+        "found": found,
+        "not_found": not_found,
+        "summary": build_summary(counts),
+    }
+
             
 if __name__ == "__main__":
     predict_with_ID("CUST-49028", "end-point-XGBoost-cred-clf-2025-03-14-10-43-30")
@@ -0,0 +1,185 @@
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from scoring import score_frame
+from scripts.feature_constants import RAW_FEATURE_COLUMNS
+
+# Most scored rows kept (0 disables the cache)
+PREDICTION_CACHE_ROWS = int(os.environ.get("PREDICTION_CACHE_ROWS", 500000))
+# Entries older than this are scored again
+PREDICTION_CACHE_TTL_SECONDS = float(os.environ.get("PREDICTION_CACHE_TTL_SECONDS", 3600))
+
+
+def row_fingerprints(raw_data):
+    """
+        64-bit hash of each row's raw input fields (Customer_ID is not part
+        of it).
+    """
+    columns = [col for col in RAW_FEATURE_COLUMNS if col in raw_data.columns]
+    return pd.util.hash_pandas_object(raw_data[columns], index=False).to_numpy()
+
+
+def row_keys(raw_data, model_version):
+    """
+        64-bit key per row: its fingerprint mixed with the model/preprocessor
+        version.
+    """
+    return row_fingerprints(raw_data) ^ np.uint64(int(model_version or "0", 16))
+
+
+class PredictionCache:
+    """
+        Row key -> score with a TTL on every entry, evicting the least
+        recently used entries once full. Entries are held in numpy arrays
+        sorted by key, so a batch of keys is looked up or inserted with a
+        few vectorized operations instead of one dict access per row.
+    """
+
+    def __init__(self, max_rows=PREDICTION_CACHE_ROWS, ttl=PREDICTION_CACHE_TTL_SECONDS):
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._keys = np.empty(0, dtype=np.uint64)
+        self._scores = np.empty(0, dtype=np.float64)
+        self._expires_at = np.empty(0, dtype=np.float64)
+        # Batch counter at each entry's last lookup or insert, for LRU eviction
+        self._used = np.empty(0, dtype=np.int64)
+        self._tick = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _find(self, keys):
+        # Position of each key in _keys and whether it is there
+        if len(self._keys) == 0:
+            return np.zeros(len(keys), dtype=np.intp), np.zeros(len(keys), dtype=bool)
+        positions = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        return positions, self._keys[positions] == keys
+
+    def get_many(self, keys):
+        """
+            Return (scores, positions of keys without a live entry); scores
+            at those positions are NaN.
+        """
+        keys = np.asarray(keys, dtype=np.uint64)
+        scores = np.full(len(keys), np.nan)
+        now = time.monotonic()
+        with self._lock:
+            positions, found = self._find(keys)
+            hit = found.copy()
+            hit[found] = self._expires_at[positions[found]] >= now
+            scores[hit] = self._scores[positions[hit]]
+            self._tick += 1
+            self._used[positions[hit]] = self._tick
+            missing = np.flatnonzero(~hit)
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        return scores, missing
+
+    def put_many(self, keys, scores):
+        keys = np.asarray(keys, dtype=np.uint64)
+        scores = np.asarray(scores, dtype=np.float64)
+        # One entry per key, the last score given for it
+        keys, last = np.unique(keys[::-1], return_index=True)
+        scores = scores[::-1][last]
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._tick += 1
+            positions, found = self._find(keys)
+            # Keys already cached are updated in place
+            self._scores[positions[found]] = scores[found]
+            self._expires_at[positions[found]] = expires_at
+            self._used[positions[found]] = self._tick
+
+            # New keys (sorted by np.unique) are inserted in key order
+            new = ~found
+            at = np.searchsorted(self._keys, keys[new])
+            self._keys = np.insert(self._keys, at, keys[new])
+            self._scores = np.insert(self._scores, at, scores[new])
+            self._expires_at = np.insert(self._expires_at, at, expires_at)
+            self._used = np.insert(self._used, at, self._tick)
+
+            overflow = len(self._keys) - self.max_rows
+            if overflow > 0:
+                # Expired entries go first, then the least recently used
+                age = np.where(self._expires_at < time.monotonic(), -1, self._used)
+                drop = np.argpartition(age, overflow - 1)[:overflow]
+                self._keys, self._scores, self._expires_at, self._used = (
+                    np.delete(array, drop) for array in (self._keys, self._scores, self._expires_at, self._used))
+                self.evictions += overflow
+
+    def clear(self):
+        with self._lock:
+            self._keys, self._scores, self._expires_at, self._used = (
+                array[:0] for array in (self._keys, self._scores, self._expires_at, self._used))
+
+    def approx_bytes(self):
+        return self._keys.nbytes + self._scores.nbytes + self._expires_at.nbytes + self._used.nbytes
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._keys),
+            "max_rows": self.max_rows,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "approx_bytes": self.approx_bytes(),
+        }
+
+
+class CachedScorer:
+    """
+        Scores rows through the prediction cache: only rows without a cached
+        score (deduplicated) are preprocessed and sent to the model, in
+        process or through `inner` (a ParallelScorer) when given.
+    """
+
+    def __init__(self, cache, model, plan, model_version, inner=None):
+        self.cache = cache
+        self.model = model
+        self.plan = plan
+        self.model_version = model_version
+        self.inner = inner
+
+    def _score_misses(self, raw_data):
+        if self.inner is not None:
+            return self.inner.score(raw_data)
+        return score_frame(raw_data, self.model, self.plan)
+
+    def score(self, raw_data):
+        keys = row_keys(raw_data, self.model_version)
+        scores, missing = self.cache.get_many(keys)
+        if len(missing):
+            unique_keys, first, inverse = np.unique(keys[missing], return_index=True, return_inverse=True)
+            fresh = self._score_misses(raw_data.iloc[missing[first]])
+            scores[missing] = fresh[inverse]
+            self.cache.put_many(unique_keys, fresh)
+        return scores.astype(np.float32)
+
+
+def make_prediction_cache(max_rows=PREDICTION_CACHE_ROWS):
+    """
+        PredictionCache, or None when PREDICTION_CACHE_ROWS is 0.
+    """
+    if max_rows <= 0:
+        return None
+    return PredictionCache(max_rows)
+
+
+def make_file_scorer(cache, model, plan, model_version, parallel_scorer=None):
+    """
+        Scorer for uploads: the prediction cache in front of the process
+        pool (or in-process scoring). Without a cache this is just the pool,
+        or None for plain in-process scoring.
+    """
+    if cache is None:
+        return parallel_scorer
+    return CachedScorer(cache, model, plan, model_version, parallel_scorer)
@@ -0,0 +1,260 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from artifacts import load_artifacts, warmup_frame, MODEL_PATH, PREPROCESSOR_PATH
+from batching import make_micro_batcher
+from parallel import make_parallel_scorer
+from prediction_cache import make_file_scorer
+from score_table import ScoreTable, artifact_version, SCORE_TABLE_PATH
+from shadow import ShadowedModel, make_shadow_scorer
+
+# Directory of versioned artifacts: one subdirectory per version holding
+# model2.pkl and preprocessor.pkl; the last one by name is served. Without
+# it MODEL_PATH / PREPROCESSOR_PATH are watched for changes instead.
+MODEL_DIR = os.environ.get("MODEL_DIR")
+# How often (seconds) to look for new artifacts (0 disables watching)
+MODEL_POLL_SECONDS = float(os.environ.get("MODEL_POLL_SECONDS", 30))
+
+logger = logging.getLogger(__name__)
+
+
+def score_table_signature(path=SCORE_TABLE_PATH):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_score_table(version):
+    """
+        Precomputed scores for known customers (built by `python
+        score_table.py`) if they were built with model `version`.
+    """
+    score_table = ScoreTable.load()
+    if score_table is not None and score_table.model_version != version:
+        logger.warning("Ignoring score table built for model %s", score_table.model_version)
+        score_table = None
+    return score_table
+
+
+class ModelBundle:
+    """
+        One loaded model version with everything built from it. Requests
+        hold a reference while they run; a replaced bundle is shut down once
+        the last of them is done.
+    """
+
+    def __init__(self, version, paths, model, plan, score_table, parallel_scorer, id_batcher, file_scorer,
+                 shadow=None):
+        self.version = version
+        self.paths = paths
+        self.model = model
+        self.plan = plan
+        self.score_table = score_table
+        # File the score table was read from, to notice when the batch job rewrites it
+        self.score_table_signature = None
+        self.parallel_scorer = parallel_scorer
+        self.id_batcher = id_batcher
+        self.file_scorer = file_scorer
+        self.shadow = shadow
+        self.loaded_at = time.time()
+        self.in_flight = 0
+        self.retired = False
+
+    def shutdown(self):
+        if self.id_batcher is not None:
+            self.id_batcher.stop()
+        if self.parallel_scorer is not None:
+            self.parallel_scorer.shutdown()
+        if self.shadow is not None:
+            self.shadow.stop()
+
+
+def load_bundle(model_path, preprocessor_path, prediction_cache=None):
+    """
+        Load one artifact version, build its scorers and run a warm-up
+        prediction through them.
+    """
+    model, plan, version = load_artifacts(model_path, preprocessor_path)
+
+    score_table_file = score_table_signature()
+    score_table = load_score_table(version)
+
+    # Candidate models scoring the same feature matrices off the request path
+    shadow = make_shadow_scorer(plan.n_features)
+    if shadow is not None:
+        model = ShadowedModel(model, shadow)
+
+    # Multi-process scoring of large uploads (enabled with SCORING_PROCESSES > 1)
+    parallel_scorer = make_parallel_scorer(model, plan, model_path, preprocessor_path)
+    file_scorer = make_file_scorer(prediction_cache, model, plan, version, parallel_scorer)
+    # Concurrent customerID lookups scored together (ID_BATCH_WINDOW_MS=0 disables)
+    id_batcher = make_micro_batcher(model, plan)
+
+    bundle = ModelBundle(version, (model_path, preprocessor_path), model, plan, score_table,
+                         parallel_scorer, id_batcher, file_scorer, shadow)
+    bundle.score_table_signature = score_table_file
+    try:
+        if id_batcher is not None:
+            id_batcher.score(warmup_frame())
+        if file_scorer is not None:
+            file_scorer.score(warmup_frame())
+        else:
+            model.predict_proba(plan.transform(warmup_frame()))
+    except Exception:
+        bundle.shutdown()
+        raise
+    return bundle
+
+
+class ModelRegistry:
+    """
+        Serves the active ModelBundle and swaps in new artifact versions
+        without a restart. New versions are loaded and warmed in the
+        background; the swap is a single reference change, so new requests
+        get the new model while in-flight ones finish on the old one.
+    """
+
+    def __init__(self, prediction_cache=None, model_dir=MODEL_DIR, poll_seconds=MODEL_POLL_SECONDS):
+        self.prediction_cache = prediction_cache
+        self.model_dir = model_dir
+        self.poll_seconds = poll_seconds
+        self._active = None
+        self._signature = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @property
+    def active(self):
+        return self._active
+
+    @property
+    def version(self):
+        bundle = self._active
+        return bundle.version if bundle is not None else None
+
+    def latest_paths(self):
+        """
+            (model path, preprocessor path) of the newest published version.
+        """
+        if not self.model_dir:
+            return MODEL_PATH, PREPROCESSOR_PATH
+
+        versions = sorted(
+            name for name in os.listdir(self.model_dir)
+            if os.path.exists(os.path.join(self.model_dir, name, os.path.basename(MODEL_PATH)))
+            and os.path.exists(os.path.join(self.model_dir, name, os.path.basename(PREPROCESSOR_PATH)))
+        )
+        if not versions:
+            raise FileNotFoundError(f"No model versions found in {self.model_dir}")
+        latest = os.path.join(self.model_dir, versions[-1])
+        return os.path.join(latest, os.path.basename(MODEL_PATH)), os.path.join(latest, os.path.basename(PREPROCESSOR_PATH))
+
+    def acquire(self):
+        """
+            The active bundle, held until release() is called.
+        """
+        with self._lock:
+            bundle = self._active
+            if bundle is None:
+                raise RuntimeError("No model loaded")
+            bundle.in_flight += 1
+            return bundle
+
+    def release(self, bundle):
+        with self._lock:
+            bundle.in_flight -= 1
+            done = bundle.retired and bundle.in_flight == 0
+        if done:
+            bundle.shutdown()
+
+    @contextmanager
+    def use(self):
+        bundle = self.acquire()
+        try:
+            yield bundle
+        finally:
+            self.release(bundle)
+
+    def _swap(self, bundle):
+        with self._lock:
+            previous, self._active = self._active, bundle
+            if previous is not None:
+                previous.retired = True
+                done = previous.in_flight == 0
+        # Cached scores are keyed by version, so this only frees memory
+        if self.prediction_cache is not None:
+            self.prediction_cache.clear()
+        if previous is not None and done:
+            previous.shutdown()
+        return previous
+
+    def load_latest(self, force=False):
+        """
+            Load and swap in the newest artifacts if they differ from the
+            active version. Returns True if a new version was swapped in.
+        """
+        with self._load_lock:
+            paths = self.latest_paths()
+            signature = [(path, os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in paths]
+            if not force and signature == self._signature:
+                return False
+            # Remember the files even if loading fails, so a bad version is not retried every poll
+            self._signature = signature
+
+            if not force and artifact_version(*paths) == self.version:
+                return False
+
+            start = time.perf_counter()
+            bundle = load_bundle(*paths, prediction_cache=self.prediction_cache)
+            previous = self._swap(bundle)
+            logger.info("Model %s from %s active after %.2fs (replaced %s)", bundle.version, paths[0],
+                        time.perf_counter() - start, previous.version if previous is not None else None)
+            return True
+
+    def refresh_score_table(self):
+        """
+            Swap a rewritten score table into the active bundle, so a run of
+            the batch job for new customer data is served without a model
+            change or restart. Returns True if the table was reloaded.
+        """
+        with self._load_lock:
+            bundle = self._active
+            signature = score_table_signature()
+            if bundle is None or signature == bundle.score_table_signature:
+                return False
+            bundle.score_table_signature = signature
+            # A single attribute swap; requests read bundle.score_table once per call
+            bundle.score_table = load_score_table(bundle.version)
+            if bundle.score_table is not None:
+                logger.info("Score table reloaded: %d customers, data version %s", len(bundle.score_table),
+                            bundle.score_table.data_version)
+            return True
+
+    def _watch(self):
+        while not self._stopping.wait(self.poll_seconds):
+            try:
+                self.load_latest()
+            except Exception as e:
+                logger.exception("Model reload failed, keeping %s", self.version)
+            try:
+                self.refresh_score_table()
+            except Exception:
+                logger.exception("Score table reload failed")
+
+    def start_watching(self):
+        if self.poll_seconds <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        bundle = self._active
+        if bundle is not None:
+            bundle.shutdown()
@@ -0,0 +1,135 @@
+import contextlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+import pandas as pd
+import pyarrow.parquet as pq
+from io_formats import read_arrow_table
+
+# Where scored results are kept for paging and download
+RESULTS_DIR = os.environ.get("RESULTS_DIR", os.path.join(tempfile.gettempdir(), "cred-bounce-back-results"))
+# Results are deleted after this many seconds
+RESULTS_TTL_SECONDS = float(os.environ.get("RESULTS_TTL_SECONDS", 60 * 60))
+# Upper bound on the rows returned by one page
+MAX_PAGE_ROWS = int(os.environ.get("RESULTS_MAX_PAGE_ROWS", 1000))
+
+# <result_id>.json, the state file of a stored result
+STATE_FILE = re.compile(r"([0-9a-f]{32})\.json")
+
+
+class StoredResult:
+    def __init__(self, path, fmt, total_rows, file_name):
+        self.id = uuid.uuid4().hex
+        self.path = path
+        self.fmt = fmt
+        self.total_rows = total_rows
+        self.file_name = file_name
+        self.created_at = time.time()
+
+    def to_dict(self):
+        return {"id": self.id, "path": self.path, "fmt": self.fmt, "total_rows": self.total_rows,
+                "file_name": self.file_name, "created_at": self.created_at}
+
+    @classmethod
+    def from_dict(cls, state):
+        result = cls(state["path"], state["fmt"], state["total_rows"], state["file_name"])
+        result.id = state["id"]
+        result.created_at = state["created_at"]
+        return result
+
+
+class ResultStore:
+    """
+        Keeps scored result files on local disk for a while so clients can
+        page through them (GET /results/{id}) or download them instead of
+        receiving every row in the prediction response.
+    """
+
+    def __init__(self, results_dir=RESULTS_DIR, ttl=RESULTS_TTL_SECONDS):
+        self.results_dir = results_dir
+        self.ttl = ttl
+        self._results = {}
+        self._lock = threading.Lock()
+        os.makedirs(results_dir, exist_ok=True)
+
+    def new_path(self, extension):
+        """
+            Path inside the results directory for a result about to be written.
+        """
+        return os.path.join(self.results_dir, f"{uuid.uuid4().hex}{extension}")
+
+    def register(self, path, fmt, total_rows, file_name):
+        self._purge_expired()
+        result = StoredResult(path, fmt, total_rows, file_name)
+        # Other worker processes find the result through this file
+        state_path = self._state_path(result.id)
+        with open(f"{state_path}.tmp", "w") as f:
+            json.dump(result.to_dict(), f)
+        os.replace(f"{state_path}.tmp", state_path)
+        with self._lock:
+            self._results[result.id] = result
+        return result
+
+    def get(self, result_id):
+        with self._lock:
+            result = self._results.get(result_id)
+        if result is None and re.fullmatch(r"[0-9a-f]{32}", result_id):
+            result = self._load(result_id)
+        if result is None or time.time() - result.created_at > self.ttl:
+            return None
+        return result
+
+    def _state_path(self, result_id):
+        return os.path.join(self.results_dir, f"{result_id}.json")
+
+    def _load(self, result_id):
+        try:
+            with open(self._state_path(result_id)) as f:
+                return StoredResult.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def page(self, result, offset, limit):
+        """
+            Rows [offset, offset + limit) of a stored result as a DataFrame.
+        """
+        limit = max(0, min(limit, MAX_PAGE_ROWS))
+        if result.fmt == "arrow":
+            return read_arrow_table(result.path).slice(offset, limit).to_pandas()
+
+        if result.fmt == "parquet":
+            parquet_file = pq.ParquetFile(result.path)
+            frames, start = [], 0
+            for group in range(parquet_file.num_row_groups):
+                rows = parquet_file.metadata.row_group(group).num_rows
+                if start + rows > offset and start < offset + limit:
+                    table = parquet_file.read_row_group(group)
+                    lo = max(offset - start, 0)
+                    frames.append(table.slice(lo, offset + limit - start - lo).to_pandas())
+                start += rows
+            return pd.concat(frames, ignore_index=True) if frames else parquet_file.schema_arrow.empty_table().to_pandas()
+
+        return pd.read_csv(result.path, skiprows=range(1, offset + 1), nrows=limit)
+
+    def _purge_expired(self):
+        """
+            Delete expired results through their state files, so results of
+            other worker processes (or of ones that have since restarted) go
+            too.
+        """
+        now = time.time()
+        for name in os.listdir(self.results_dir):
+            match = STATE_FILE.fullmatch(name)
+            result = match and self._load(match.group(1))
+            if not result or now - result.created_at <= self.ttl:
+                continue
+            with self._lock:
+                self._results.pop(result.id, None)
+            for path in (result.path, self._state_path(result.id)):
+                # Another worker may be purging the same result
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
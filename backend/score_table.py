@@ -0,0 +1,211 @@
+import hashlib
+import os
+from collections.abc import Mapping
+import numpy as np
+import pandas as pd
+from scoring import score_frame
+from prediction_cache import row_fingerprints
+from id_index import IdIndex, index_path
+from io_formats import save_snapshot, load_snapshot, read_arrow_table, snapshot_metadata, arrow_frame, format_from_name
+
+# Arrow IPC (or .parquet) file written by `python score_table.py`. Arrow
+# tables are memory-mapped, so workers on one host share a single copy
+SCORE_TABLE_PATH = os.environ.get("SCORE_TABLE_PATH", "score_table.arrow")
+
+
+def artifact_version(*paths):
+    """
+        Short content hash of the given artifact files, used to tell model /
+        preprocessor versions apart.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+class MappedScores(Mapping):
+    """
+        Read-only Customer_ID -> score view of a memory-mapped score table,
+        looked up through its IdIndex.
+    """
+
+    def __init__(self, ids, scores, index):
+        self.ids = ids
+        self.scores = scores
+        self.index = index
+
+    def __getitem__(self, customer_id):
+        rows = self.index.get(customer_id)
+        if rows is None:
+            raise KeyError(customer_id)
+        return float(self.scores[rows[0]])
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get_many(self, customer_ids):
+        rows = self.index.get_many(customer_ids)
+        if len(self.scores) == 0:
+            return [None] * len(rows)
+        scores = self.scores[np.maximum(rows, 0)].tolist()
+        return [score if row >= 0 else None for score, row in zip(scores, rows)]
+
+    # Whole-table reads in one pass instead of one index lookup per key
+    def items(self):
+        return zip(self.ids.tolist(), self.scores.tolist())
+
+    def values(self):
+        return self.scores.tolist()
+
+
+class ScoreTable:
+    """
+        Precomputed scores for the known customer population, keyed by
+        Customer_ID. Only valid for the model and data versions it was
+        built from. The fingerprint of each customer's row is kept so the
+        table can be brought up to date by rescoring only changed rows.
+    """
+
+    def __init__(self, scores, model_version, data_version, fingerprints=None):
+        self.scores = scores
+        self.model_version = model_version
+        self.data_version = data_version
+        # uint64 Series indexed by Customer_ID
+        self.fingerprints = fingerprints
+
+    def __len__(self):
+        return len(self.scores)
+
+    def is_current(self, model_version, data_version):
+        return self.model_version == model_version and self.data_version == data_version
+
+    def get(self, customer_id):
+        return self.scores.get(customer_id)
+
+    def get_many(self, customer_ids):
+        """
+            Score of each of `customer_ids`, None where there is none.
+        """
+        if isinstance(self.scores, MappedScores):
+            return self.scores.get_many(customer_ids)
+        return [self.scores.get(customer_id) for customer_id in customer_ids]
+
+    def save(self, path=SCORE_TABLE_PATH):
+        ids = list(self.scores)
+        frame = pd.DataFrame({"Customer_ID": ids, "score": list(self.scores.values())})
+        if self.fingerprints is not None:
+            frame["fingerprint"] = self.fingerprints.reindex(ids).to_numpy()
+        # Index first: servers reload the table when its file changes
+        if format_from_name(path) == "arrow":
+            IdIndex.build(frame["Customer_ID"].to_numpy()).save(index_path(path), self._index_version())
+        save_snapshot(frame, path, {"model_version": self.model_version, "data_version": self.data_version})
+
+    def _index_version(self):
+        return f"{self.model_version}:{self.data_version}"
+
+    @classmethod
+    def load(cls, path=SCORE_TABLE_PATH):
+        if not os.path.exists(path):
+            return None
+        if format_from_name(path) == "arrow":
+            return cls._load_mapped(path)
+        frame, metadata = load_snapshot(path)
+        ids = frame["Customer_ID"].to_numpy()
+        fingerprints = None
+        if "fingerprint" in frame.columns:
+            fingerprints = pd.Series(frame["fingerprint"].to_numpy(), index=ids)
+        return cls(dict(zip(ids.tolist(), frame["score"].tolist())), metadata["model_version"],
+                   metadata["data_version"], fingerprints)
+
+    @classmethod
+    def _load_mapped(cls, path):
+        arrow_table = read_arrow_table(path)
+        metadata = snapshot_metadata(arrow_table)
+        frame = arrow_frame(arrow_table)
+        ids = frame["Customer_ID"].array
+        table = cls(None, metadata["model_version"], metadata["data_version"])
+        # Rebuilt in memory if the saved index is missing or from another build
+        index = IdIndex.load(index_path(path), ids, table._index_version()) or IdIndex.build(ids)
+        table.scores = MappedScores(ids, frame["score"].to_numpy(), index)
+        if "fingerprint" in frame.columns:
+            table.fingerprints = pd.Series(frame["fingerprint"].to_numpy(), index=pd.Index(ids))
+        return table
+
+
+def first_rows(raw_data):
+    """
+        The first row of every Customer_ID, as in predict_with_ID.
+    """
+    _, first = np.unique(raw_data["Customer_ID"].to_numpy(), return_index=True)
+    first.sort()
+    return raw_data.iloc[first]
+
+
+def build_score_table(raw_data, model, plan, model_version, data_version):
+    """
+        Score every customer in `raw_data` in one batch. Where a Customer_ID
+        appears more than once the first row wins, as in predict_with_ID.
+    """
+    rows = first_rows(raw_data)
+    ids = rows["Customer_ID"].to_numpy()
+    scores = np.round(score_frame(rows, model, plan).astype(float), 3)
+    return ScoreTable(dict(zip(ids.tolist(), scores.tolist())), model_version, data_version,
+                      pd.Series(row_fingerprints(rows), index=ids))
+
+
+def update_score_table(table, raw_data, model, plan, model_version, data_version):
+    """
+        Bring `table` up to date with `raw_data`, scoring only customers that
+        were inserted or whose row changed (by fingerprint) and dropping
+        deleted ones. A table built for another model version, without
+        fingerprints or empty, is rebuilt in full. Returns (table, change counts).
+    """
+    if (table is None or table.model_version != model_version or table.fingerprints is None
+            or len(table.fingerprints) == 0):
+        table = build_score_table(raw_data, model, plan, model_version, data_version)
+        return table, {"full": True, "scored": len(table)}
+
+    rows = first_rows(raw_data)
+    fingerprints = pd.Series(row_fingerprints(rows), index=rows["Customer_ID"].to_numpy())
+    previous = table.fingerprints
+
+    # Position of each current customer in the previous table (-1 if new)
+    positions = previous.index.get_indexer(fingerprints.index)
+    inserted = positions < 0
+    stale = inserted | (previous.to_numpy()[positions] != fingerprints.to_numpy())
+    deleted = previous.index[fingerprints.index.get_indexer(previous.index) < 0]
+
+    scores = dict(table.scores.items())
+    for customer_id in deleted:
+        del scores[customer_id]
+    if stale.any():
+        stale_scores = np.round(score_frame(rows[stale], model, plan).astype(float), 3)
+        scores.update(zip(fingerprints.index[stale].tolist(), stale_scores.tolist()))
+
+    changes = {"full": False, "scored": int(stale.sum()), "inserted": int(inserted.sum()),
+               "changed": int(stale.sum() - inserted.sum()), "deleted": len(deleted)}
+    return ScoreTable(scores, model_version, data_version, fingerprints), changes
+
+
+if __name__ == "__main__":
+    # Batch job: python score_table.py [--full]
+    # Rescores only changed customers unless the model changed or --full is given
+    import sys
+    from predict_with_id import customer_store
+    from artifacts import load_artifacts
+    from registry import ModelRegistry
+
+    model, plan, model_version = load_artifacts(*ModelRegistry().latest_paths())
+
+    data, _, data_version = customer_store.load()
+    previous = None if "--full" in sys.argv[1:] else ScoreTable.load()
+    table, changes = update_score_table(previous, data, model, plan, model_version, data_version)
+    table.save()
+    print(f"Scored {changes['scored']} of {len(table)} customers {changes} "
+          f"(model {model_version}, data {data_version}) -> {SCORE_TABLE_PATH}")
@@ -0,0 +1,29 @@
+import os
+import numpy as np
+from metrics import stage
+
+# Rows transformed and scored at a time; bounds the feature matrix (and the
+# model's copy of it) for large frames
+SCORE_BLOCK_ROWS = int(os.environ.get("SCORE_BLOCK_ROWS", 100000))
+
+
+def score_frame(raw_data, model, plan, block_rows=SCORE_BLOCK_ROWS):
+    """
+        Build the model input for raw customer rows with the compiled
+        preprocessing plan and return the positive-class probability for each
+        row, in input order.
+    """
+    if block_rows <= 0 or len(raw_data) <= block_rows:
+        return _score_block(raw_data, model, plan)
+
+    scores = np.empty(len(raw_data), dtype=np.float32)
+    for start in range(0, len(raw_data), block_rows):
+        scores[start:start + block_rows] = _score_block(raw_data.iloc[start:start + block_rows], model, plan)
+    return scores
+
+
+def _score_block(raw_data, model, plan):
+    with stage("transform", rows=len(raw_data)):
+        features = plan.transform(raw_data)
+    with stage("predict", rows=len(features)):
+        return model.predict_proba(features)[:, 1]
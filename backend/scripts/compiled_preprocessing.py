@@ -0,0 +1,164 @@
+import json
+import numpy as np
+import pandas as pd
+from scripts.feature_constants import JOB_MAP, BINARY_MAPPINGS, LOG_TRANSFORM_COLS
+
+# Columns engineer_features derives from personal_status
+PERSONAL_STATUS_PARTS = {'gender': 0, 'marital_status': 1}
+
+
+def _map_distinct(column, func, dtype):
+    """
+        Apply `func` to each distinct value of `column` (hash-factorized), then
+        broadcast the results back to every row. Python work is proportional
+        to the number of distinct values, not rows. Missing values map to
+        func(None).
+    """
+    codes, uniques = pd.factorize(column)
+    mapped = np.array([func(value) for value in uniques] + [func(None)], dtype=dtype)
+    return mapped[codes]
+
+
+def _source_value(col):
+    """Return (raw column, value extractor) for a feature column."""
+    if col in PERSONAL_STATUS_PARTS:
+        part = PERSONAL_STATUS_PARTS[col]
+
+        def extract(value):
+            if value is None:
+                return None
+            parts = value.split(' ', 1)
+            return parts[part] if len(parts) > part else ''
+        return 'personal_status', extract
+    return col, lambda value: value
+
+
+class CompiledPlan:
+    """
+        Inference-only version of a fitted preprocessor. Holds the scaler
+        statistics and the one-hot positions of the chi-square selected
+        features only, and fills one float32 matrix per batch without going
+        through ColumnTransformer or intermediate DataFrames.
+    """
+
+    def __init__(self, feature_names, numeric, categorical, binary):
+        self.feature_names = feature_names
+        # [(feature, output column, mean, scale)]
+        self.numeric = numeric
+        # {raw column: {category value: output column}}
+        self.categorical = categorical
+        # [(feature, output column)]
+        self.binary = binary
+
+    @property
+    def n_features(self):
+        return len(self.feature_names)
+
+    def _numeric_column(self, df, col, cache):
+        if col in cache:
+            return cache[col]
+
+        if col == 'job':
+            value = _map_distinct(df['job'], lambda v: JOB_MAP.get(v, np.nan), np.float64)
+        elif col == 'credit_job_ratio':
+            job = self._numeric_column(df, 'job', cache)
+            value = self._numeric_column(df, 'credit_amount', cache) / np.where(job == 0, 1, job)
+        elif col == 'credit_age_ratio':
+            value = self._numeric_column(df, 'credit_amount', cache) / self._numeric_column(df, 'age', cache)
+        elif col == 'monthly_burden':
+            value = self._numeric_column(df, 'credit_amount', cache) / self._numeric_column(df, 'duration', cache)
+        elif col == 'debt_burden':
+            value = self._numeric_column(df, 'installment_commitment', cache) * self._numeric_column(df, 'existing_credits', cache)
+        else:
+            value = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+
+        cache[col] = value
+        return value
+
+    def transform(self, df):
+        """
+            Build the model input matrix (rows x selected features, float32)
+            from raw customer rows.
+        """
+        out = np.zeros((len(df), self.n_features), dtype=np.float32)
+        if len(df) == 0:
+            return out
+        cache = {}
+
+        for name, idx, mean, scale in self.numeric:
+            value = self._numeric_column(df, name, cache)
+            if name in LOG_TRANSFORM_COLS:
+                value = np.log1p(value)
+            out[:, idx] = (value - mean) / scale
+
+        for col, columns in self.categorical.items():
+            source, extract = _source_value(col)
+            target = _map_distinct(df[source], lambda v: columns.get(extract(v), -1), np.intp)
+            rows = np.nonzero(target >= 0)[0]
+            out[rows, target[rows]] = 1.0
+
+        for name, idx in self.binary:
+            source, extract = _source_value(name)
+            mapping = BINARY_MAPPINGS[name]
+            out[:, idx] = _map_distinct(df[source], lambda v: mapping.get(extract(v), np.nan), np.float32)
+
+        return out
+
+    def save(self, path):
+        """
+            Write the plan as JSON; loading it needs neither sklearn nor
+            pickle.
+        """
+        with open(path, "w") as f:
+            json.dump({
+                "feature_names": self.feature_names,
+                "numeric": self.numeric,
+                "categorical": self.categorical,
+                "binary": self.binary,
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            payload = json.load(f)
+        return cls(
+            payload["feature_names"],
+            [tuple(entry) for entry in payload["numeric"]],
+            payload["categorical"],
+            [tuple(entry) for entry in payload["binary"]],
+        )
+
+
+def compile_preprocessor(preprocessor):
+    """
+        Export a CompiledPlan from a preprocessor fitted by fit_full_pipeline.
+    """
+    selected = list(preprocessor.chi_square_selected_features)
+    position = {name: idx for idx, name in enumerate(selected)}
+
+    numeric, categorical, binary = [], {}, []
+    for kind, transformer, cols in preprocessor.transformers_:
+        if kind == 'num':
+            scaler = transformer.named_steps['scaler']
+            for col, mean, scale in zip(cols, scaler.mean_, scaler.scale_):
+                if col in position:
+                    numeric.append((col, position[col], float(mean), float(scale)))
+        elif kind == 'cat':
+            onehot = transformer.named_steps['onehot']
+            for col, col_categories in zip(cols, onehot.categories_):
+                columns = {
+                    category: position[f"{col}_{category}"]
+                    for category in col_categories if f"{col}_{category}" in position
+                }
+                if columns:
+                    categorical[col] = columns
+        elif kind == 'remainder':
+            for col in preprocessor.feature_names_in_[cols]:
+                if col in position:
+                    binary.append((col, position[col]))
+
+    covered = len(numeric) + sum(len(columns) for columns in categorical.values()) + len(binary)
+    if covered != len(selected):
+        raise ValueError(f"Compiled plan covers {covered} of {len(selected)} selected features.")
+
+    return CompiledPlan(selected, numeric, categorical, binary)
@@ -0,0 +1,70 @@
+# Feature constants shared by the training pipeline and the serving path.
+# Kept free of sklearn imports so the server can load them cheaply.
+
+JOB_MAP = {
+    'high qualif/self emp/mgmt': 4,
+    'skilled': 3,
+    'unskilled resident': 2,
+    'unemp/unskilled non res': 1
+}
+
+BINARY_MAPPINGS = {
+    'gender': {'male': 1, 'female': 0},
+    'own_telephone': {'yes': 1, 'none': 0},
+    'foreign_worker': {'yes': 1, 'no': 0},
+    'class': {'good': 1, 'bad': 0}
+}
+
+# Raw input fields each engineered feature is computed from
+ENGINEERED_SOURCES = {
+    'credit_job_ratio': ['credit_amount', 'job'],
+    'credit_age_ratio': ['credit_amount', 'age'],
+    'monthly_burden': ['credit_amount', 'duration'],
+    'debt_burden': ['installment_commitment', 'existing_credits'],
+}
+
+LOG_TRANSFORM_COLS = ['credit_amount', 'age', 'credit_job_ratio', 'credit_age_ratio', 'monthly_burden']
+
+# Raw input fields the pipeline reads (besides Customer_ID)
+RAW_FEATURE_COLUMNS = [
+    'checking_status', 'duration', 'credit_history', 'purpose', 'credit_amount',
+    'savings_status', 'employment', 'installment_commitment', 'personal_status',
+    'other_parties', 'residence_since', 'property_magnitude', 'age',
+    'other_payment_plans', 'housing', 'existing_credits', 'job', 'num_dependents',
+    'own_telephone', 'foreign_worker', 'class'
+]
+
+# Known values of the categorical input fields (from the training data).
+# Inputs are read into categoricals over these; values not listed here are
+# kept and appended to the categories.
+CATEGORY_VALUES = {
+    'checking_status': ['0<=X<200', '<0', '>=200', 'no checking'],
+    'credit_history': ['all paid', 'critical/other existing credit', 'delayed previously', 'existing paid',
+                       'no credits/all paid'],
+    'purpose': ['business', 'domestic appliance', 'education', 'furniture/equipment', 'new car', 'other',
+                'radio/tv', 'repairs', 'retraining', 'used car'],
+    'savings_status': ['100<=X<500', '500<=X<1000', '<100', '>=1000', 'no known savings'],
+    'employment': ['1<=X<4', '4<=X<7', '<1', '>=7', 'unemployed'],
+    'personal_status': ['female div/dep/mar', 'male div/sep', 'male mar/wid', 'male single'],
+    'other_parties': ['co applicant', 'guarantor', 'none'],
+    'property_magnitude': ['car', 'life insurance', 'no known property', 'real estate'],
+    'other_payment_plans': ['bank', 'none', 'stores'],
+    'housing': ['for free', 'own', 'rent'],
+    'job': ['high qualif/self emp/mgmt', 'skilled', 'unemp/unskilled non res', 'unskilled resident'],
+    'own_telephone': ['none', 'yes'],
+    'foreign_worker': ['no', 'yes'],
+    'class': ['bad', 'good'],
+}
+
+# Integer dtype each numeric input field is read into. Fixed rather than the
+# smallest type that fits each chunk, so every chunk of a file gets the same
+# schema; a column with values outside its type is left as int64.
+INTEGER_DTYPES = {
+    'duration': 'int16',
+    'credit_amount': 'int32',
+    'installment_commitment': 'int8',
+    'residence_since': 'int8',
+    'age': 'int16',
+    'existing_credits': 'int8',
+    'num_dependents': 'int8',
+}
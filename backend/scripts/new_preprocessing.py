@@ -1,9 +1,13 @@
+import logging
 import numpy as np
 import pandas as pd
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from sklearn.feature_selection import SelectKBest, chi2
+from scripts.feature_constants import JOB_MAP, BINARY_MAPPINGS, LOG_TRANSFORM_COLS, RAW_FEATURE_COLUMNS
+
+logger = logging.getLogger(__name__)
 
 
 def split_personal_status(status):
@@ -13,23 +17,25 @@ def split_personal_status(status):
     return pd.Series([gender, marital_status])
 
 
-def engineer_features(df):
-    df = df.copy()
+def split_personal_status_column(status):
+    """Vectorized split of a personal_status column into (gender, marital_status)."""
+    parts = status.str.split(' ', n=1, expand=True).reindex(columns=[0, 1])
+    return parts[0], parts[1].fillna('')
+
+
+def engineer_features(df, copy=True):
+    """Add the derived features. With copy=False `df` itself is modified."""
+    if copy:
+        df = df.copy()
     if 'Customer_ID' in df.columns:
-        df = df.drop(columns=['Customer_ID'])
+        df.drop(columns=['Customer_ID'], inplace=True)
 
-    df[['gender', 'marital_status']] = df['personal_status'].apply(split_personal_status)
+    df['gender'], df['marital_status'] = split_personal_status_column(df['personal_status'])
     df.drop(columns=['personal_status'], inplace=True)
 
-    job_map = {
-        'high qualif/self emp/mgmt': 4,
-        'skilled': 3,
-        'unskilled resident': 2,
-        'unemp/unskilled non res': 1
-    }
-
     if 'job' in df.columns:
-        df['job'] = df['job'].map(job_map)
+        # Compact frames hold job as a categorical, which cannot be divided
+        df['job'] = pd.to_numeric(df['job'].astype(object).map(JOB_MAP))
 
     if 'credit_amount' in df.columns and 'job' in df.columns:
         df['credit_job_ratio'] = df['credit_amount'] / df['job'].replace(0, 1)
@@ -41,20 +47,15 @@ def engineer_features(df):
         df['monthly_burden'] = df['credit_amount'] / df['duration']
 
     if 'installment_commitment' in df.columns and 'existing_credits' in df.columns:
-        df['debt_burden'] = df['installment_commitment'] * df['existing_credits']
+        # Widen downcast integer columns so the product cannot overflow
+        installment = df['installment_commitment']
+        df['debt_burden'] = installment.astype(np.result_type(installment.dtype, np.int64)) * df['existing_credits']
 
     return df
 
 
 def build_preprocessor(df, encoding_method='onehot', drop_first=False, handle_unknown='ignore'):
     """Create preprocessing transformer and extract transformed feature names."""
-    binary_mappings = {
-        'gender': {'male': 1, 'female': 0},
-        'own_telephone': {'yes': 1, 'none': 0},
-        'foreign_worker': {'yes': 1, 'no': 0},
-        'class': {'good': 1, 'bad': 0}
-    }
-
     binary_cols = ['own_telephone', 'foreign_worker', 'class', 'gender']
     multi_category_cols = [
         'checking_status', 'credit_history', 'purpose', 'savings_status',
@@ -72,9 +73,9 @@ def build_preprocessor(df, encoding_method='onehot', drop_first=False, handle_un
     binary_cols = [col for col in binary_cols if col in df.columns]
 
     for col in binary_cols:
-        df[col] = df[col].map(binary_mappings.get(col, {}))
+        df[col] = df[col].map(BINARY_MAPPINGS.get(col, {}))
 
-    for col in ['credit_amount', 'age', 'credit_job_ratio', 'credit_age_ratio', 'monthly_burden']:
+    for col in LOG_TRANSFORM_COLS:
         if col in df.columns:
             df[col] = np.log1p(df[col])
 
@@ -143,37 +144,31 @@ def fit_full_pipeline(df, top_k=60, p_thresh=0.05):
     return final_df, preprocessor
 
 
-def apply_preprocessing(new_df, preprocessor):
-    """Apply previously-fitted preprocessing on new data."""
-    new_df = engineer_features(new_df)
+def apply_preprocessing(new_df, preprocessor, copy=True):
+    """Apply previously-fitted preprocessing on new data (in place with copy=False)."""
+    new_df = engineer_features(new_df, copy)
     # print(new_df.columns)
     # print(new_df.to_json(orient= 'records'))
     # print(new_df.shape, new_df.columns)
 
-    binary_mappings = {
-        'gender': {'male': 1, 'female': 0},
-        'own_telephone': {'yes': 1, 'none': 0},
-        'foreign_worker': {'yes': 1, 'no': 0},
-        'class': {'good': 1, 'bad': 0}
-    }
-
     binary_cols = ['own_telephone', 'foreign_worker', 'class', 'gender']
     binary_cols = [col for col in binary_cols if col in new_df.columns]
 
     for col in binary_cols:
-        new_df[col] = new_df[col].map(binary_mappings.get(col, {}))
+        new_df[col] = new_df[col].map(BINARY_MAPPINGS.get(col, {}))
 
-    for col in ['credit_amount', 'age', 'credit_job_ratio', 'credit_age_ratio', 'monthly_burden']:
+    for col in LOG_TRANSFORM_COLS:
         if col in new_df:
-            new_df[col] = np.log1p(new_df[col])
+            # float64 like a plain read; log1p of a downcast int16 column is float32
+            new_df[col] = np.log1p(new_df[col].astype(float))
 
     X_transformed = preprocessor.transform(new_df)
-    print(X_transformed)
+    logger.debug("Transformed matrix shape: %s", X_transformed.shape)
 
 
     transformed_df = pd.DataFrame(X_transformed, columns=preprocessor.all_transformed_features, index=new_df.index)
 
-    print(transformed_df)
+    logger.debug("Transformed frame shape: %s", transformed_df.shape)
 
 
     selected_cols = preprocessor.chi_square_selected_features
@@ -0,0 +1,36 @@
+import numpy as np
+import orjson
+
+
+def _column_values(series):
+    values = series.to_numpy()
+    if values.dtype.kind in "biuf":
+        # orjson serializes numeric arrays natively (NaN becomes null)
+        return np.ascontiguousarray(values)
+    return series.tolist()
+
+
+def columnar_json(df, **extra):
+    """
+        Serialize a DataFrame as {"columns": [...], "data": {column: [values]}}
+        plus any `extra` top-level fields. Column names appear once instead of
+        once per row.
+    """
+    payload = dict(extra)
+    payload["columns"] = [str(col) for col in df.columns]
+    payload["data"] = {str(col): _column_values(df[col]) for col in df.columns}
+    return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def ndjson_lines(df):
+    """
+        One JSON object per row, newline-terminated, serialized by pandas' C
+        JSON writer without building per-row Python dicts.
+    """
+    if len(df) == 0:
+        return b""
+    return df.to_json(orient="records", lines=True).rstrip("\n").encode() + b"\n"
+
+
+def json_line(obj):
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY) + b"\n"
@@ -0,0 +1,175 @@
+import logging
+import os
+import queue
+import threading
+import numpy as np
+import pandas as pd
+from labeling import DEFAULT_TIERS
+
+# Candidate models scored next to the primary: "name=path,name=path" (a bare
+# path is named after its file). Pickled XGBClassifier or native .json/.ubj.
+SHADOW_MODELS = os.environ.get("SHADOW_MODELS", "")
+# Append per-row primary and shadow scores to this CSV (stats only if unset)
+SHADOW_LOG_PATH = os.environ.get("SHADOW_LOG_PATH")
+# Rows of feature matrices waiting for the shadow thread; a batch that would
+# go beyond this is dropped (200k rows of ~60 float32 features is ~50 MB)
+SHADOW_MAX_PENDING_ROWS = int(os.environ.get("SHADOW_MAX_PENDING_ROWS", 200000))
+
+logger = logging.getLogger(__name__)
+
+def parse_shadow_models(spec=SHADOW_MODELS):
+    """
+        {name: path} from the SHADOW_MODELS setting.
+    """
+    models = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, path = entry.rpartition("=")
+        models[name or os.path.splitext(os.path.basename(path))[0]] = path
+    return models
+
+
+def load_shadow_model(path):
+    if path.endswith((".json", ".ubj")):
+        from xgboost import XGBClassifier
+        model = XGBClassifier()
+        model.load_model(path)
+        return model
+    import joblib
+    return joblib.load(path)
+
+
+class ShadowStats:
+    def __init__(self):
+        self.rows = 0
+        self.tier_agreement = 0
+        self.abs_diff_total = 0.0
+        self.abs_diff_max = 0.0
+
+    def record(self, primary, shadow):
+        diff = np.abs(shadow - primary)
+        self.rows += len(primary)
+        self.tier_agreement += int((DEFAULT_TIERS.codes(primary) == DEFAULT_TIERS.codes(shadow)).sum())
+        self.abs_diff_total += float(diff.sum())
+        self.abs_diff_max = max(self.abs_diff_max, float(diff.max()))
+
+    def to_dict(self):
+        rows = max(self.rows, 1)
+        return {
+            "rows": self.rows,
+            "tier_agreement": round(self.tier_agreement / rows, 4),
+            "mean_abs_diff": round(self.abs_diff_total / rows, 5),
+            "max_abs_diff": round(self.abs_diff_max, 5),
+        }
+
+
+class ShadowScorer:
+    """
+        Scores the primary model's feature matrices with candidate models in
+        a background thread. Requests only pay for a queue put; when the
+        queued matrices already hold max_pending_rows rows the batch is
+        dropped rather than slowing them down.
+    """
+
+    def __init__(self, models, log_path=SHADOW_LOG_PATH, max_pending_rows=SHADOW_MAX_PENDING_ROWS):
+        self.models = models
+        self.log_path = log_path
+        self.max_pending_rows = max_pending_rows
+        self.stats = {name: ShadowStats() for name in models}
+        self.dropped = 0
+        self.dropped_rows = 0
+        self._pending_rows = 0
+        self._pending_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._thread.start()
+
+    def submit(self, features, primary_scores):
+        rows = len(primary_scores)
+        with self._pending_lock:
+            if self._pending_rows + rows > self.max_pending_rows:
+                self.dropped += 1
+                self.dropped_rows += rows
+                return
+            self._pending_rows += rows
+        self._queue.put((features, primary_scores))
+
+    def _score(self, features, primary):
+        scores = {name: model.predict_proba(features)[:, 1] for name, model in self.models.items()}
+        for name, shadow in scores.items():
+            self.stats[name].record(primary, shadow)
+
+        if self.log_path:
+            log = pd.DataFrame({"primary": primary, **scores}).round(4)
+            log.insert(1, "primary_tier", DEFAULT_TIERS.label(primary)[0])
+            log.to_csv(self.log_path, mode="a", index=False, header=not os.path.exists(self.log_path))
+
+    def _run(self):
+        while not self._stopping.is_set() or not self._queue.empty():
+            try:
+                features, primary = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self._score(features, primary)
+            except Exception:
+                logger.exception("Shadow scoring failed")
+            finally:
+                with self._pending_lock:
+                    self._pending_rows -= len(primary)
+
+    def to_dict(self):
+        return {
+            "models": {name: stats.to_dict() for name, stats in self.stats.items()},
+            "pending": self._queue.qsize(),
+            "pending_rows": self._pending_rows,
+            "dropped_batches": self.dropped,
+            "dropped_rows": self.dropped_rows,
+        }
+
+    def stop(self, timeout=5):
+        self._stopping.set()
+        self._thread.join(timeout)
+
+
+class ShadowedModel:
+    """
+        Primary model that hands every feature matrix it scores (and its
+        scores) to a ShadowScorer. Everything else is delegated to the
+        primary model.
+    """
+
+    def __init__(self, model, shadow):
+        self.model = model
+        self.shadow = shadow
+
+    def predict_proba(self, features):
+        probabilities = self.model.predict_proba(features)
+        self.shadow.submit(features, probabilities[:, 1])
+        return probabilities
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+def make_shadow_scorer(n_features, spec=SHADOW_MODELS):
+    """
+        ShadowScorer for the configured candidates that accept the primary
+        plan's `n_features` columns, or None when there are none.
+    """
+    models = {}
+    for name, path in parse_shadow_models(spec).items():
+        try:
+            model = load_shadow_model(path)
+        except Exception as e:
+            logger.warning("Shadow model %s not loaded from %s: %s", name, path, e)
+            continue
+        if getattr(model, "n_features_in_", n_features) != n_features:
+            logger.warning("Shadow model %s expects %d features, plan has %d; skipped",
+                           name, model.n_features_in_, n_features)
+            continue
+        models[name] = model
+    if not models:
+        return None
+    logger.info("Shadow models: %s", ", ".join(models))
+    return ShadowScorer(models)
@@ -0,0 +1,82 @@
+import io
+import os
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from io_formats import read_frame
+from scripts.compiled_preprocessing import CompiledPlan, compile_preprocessor
+from scripts.new_preprocessing import apply_preprocessing
+
+RAW_DATA = os.path.join(os.path.dirname(__file__), "..", "..", "raw_data1.csv")
+PREPROCESSOR = os.path.join(os.path.dirname(__file__), "..", "preprocessor.pkl")
+
+
+@pytest.fixture(scope="module")
+def preprocessor():
+    return joblib.load(PREPROCESSOR)
+
+
+@pytest.fixture(scope="module")
+def plan(preprocessor):
+    return compile_preprocessor(preprocessor)
+
+
+def reference_matrix(df, preprocessor):
+    # The serving path before the compiled plan: apply_preprocessing, then
+    # the object -> float cast and column rename done before predict_proba
+    preprocessed = apply_preprocessing(df, preprocessor)
+    for col in preprocessed.select_dtypes(include='object').columns:
+        preprocessed[col] = preprocessed[col].astype(float)
+    preprocessed.columns = preprocessed.columns.astype(str).str.replace(r'[^a-zA-Z0-9_]', '_', regex=True)
+    return preprocessed
+
+
+def raw_data():
+    df = pd.read_csv(RAW_DATA)
+    # Unknown categories: not one-hot encoded, unmapped binary and job values are NaN
+    df.loc[0, 'purpose'] = 'spaceship'
+    df.loc[1, 'own_telephone'] = 'maybe'
+    df.loc[2, 'job'] = 'astronaut'
+    # Missing categories
+    df.loc[3, 'savings_status'] = np.nan
+    df.loc[4, 'checking_status'] = np.nan
+    df.loc[5, 'foreign_worker'] = np.nan
+    # personal_status without a space: empty marital_status
+    df.loc[6, 'personal_status'] = 'female'
+    return df
+
+
+def compact_data():
+    # The same rows as read by the upload readers (categoricals, downcast integers)
+    return read_frame(io.BytesIO(raw_data().to_csv(index=False).encode()), "csv")
+
+
+def assert_matches_reference(features, expected):
+    assert features.dtype == np.float32
+    np.testing.assert_allclose(features, expected.to_numpy(dtype=np.float32), rtol=1e-6, atol=1e-6)
+
+
+def test_feature_names_match_reference(plan, preprocessor):
+    # The plan keeps the preprocessor's names; the model saw them renamed
+    expected = reference_matrix(raw_data(), preprocessor)
+    assert list(pd.Index(plan.feature_names).str.replace(r'[^a-zA-Z0-9_]', '_', regex=True)) == list(expected.columns)
+
+
+def test_transform_matches_apply_preprocessing(plan, preprocessor):
+    assert_matches_reference(plan.transform(raw_data()), reference_matrix(raw_data(), preprocessor))
+
+
+def test_transform_matches_apply_preprocessing_on_compact_frame(plan, preprocessor):
+    assert_matches_reference(plan.transform(compact_data()), reference_matrix(raw_data(), preprocessor))
+
+
+def test_saved_plan_transforms_the_same(plan, tmp_path):
+    path = tmp_path / "plan.json"
+    plan.save(path)
+    df = raw_data()
+    np.testing.assert_array_equal(CompiledPlan.load(path).transform(df), plan.transform(df))
+
+
+def test_transform_empty_frame(plan):
+    assert plan.transform(raw_data().iloc[:0]).shape == (0, plan.n_features)
@@ -0,0 +1,87 @@
+import os
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import joblib
+from io_formats import read_frame
+from scripts.new_preprocessing import engineer_features, apply_preprocessing, split_personal_status
+
+RAW_DATA = os.path.join(os.path.dirname(__file__), "..", "..", "raw_data1.csv")
+PREPROCESSOR = os.path.join(os.path.dirname(__file__), "..", "preprocessor.pkl")
+
+
+def reference_engineer_features(df):
+    # engineer_features before the split was vectorized, row by row with .apply
+    df = df.copy()
+    if 'Customer_ID' in df.columns:
+        df = df.drop(columns=['Customer_ID'])
+
+    df[['gender', 'marital_status']] = df['personal_status'].apply(split_personal_status)
+    df.drop(columns=['personal_status'], inplace=True)
+
+    df['job'] = df['job'].map({
+        'high qualif/self emp/mgmt': 4,
+        'skilled': 3,
+        'unskilled resident': 2,
+        'unemp/unskilled non res': 1
+    })
+    df['credit_job_ratio'] = df['credit_amount'] / df['job'].replace(0, 1)
+    df['credit_age_ratio'] = df['credit_amount'] / df['age']
+    df['monthly_burden'] = df['credit_amount'] / df['duration']
+    df['debt_burden'] = df['installment_commitment'] * df['existing_credits']
+    return df
+
+
+def raw_data():
+    df = pd.read_csv(RAW_DATA)
+    # A value without a space: everything is the gender, marital_status is empty
+    df.loc[0, 'personal_status'] = 'female'
+    return df
+
+
+def compact_data():
+    # What the upload readers produce: categoricals and downcast integers
+    with open(RAW_DATA, "rb") as f:
+        df = read_frame(f, "csv")
+    df['personal_status'] = df['personal_status'].astype(object)
+    df.loc[0, 'personal_status'] = 'female'
+    return df
+
+
+def test_engineer_features_matches_apply_reference():
+    df = raw_data()
+    pdt.assert_frame_equal(engineer_features(df), reference_engineer_features(df))
+
+
+def test_engineer_features_leaves_input_alone_by_default():
+    df = raw_data()
+    before = df.copy()
+    engineer_features(df)
+    pdt.assert_frame_equal(df, before)
+
+
+def test_engineer_features_missing_personal_status():
+    # The .apply reference raises on NaN; the vectorized split keeps the row
+    df = raw_data()
+    df.loc[1, 'personal_status'] = np.nan
+    result = engineer_features(df)
+
+    assert pd.isna(result.loc[1, 'gender'])
+    assert result.loc[1, 'marital_status'] == ''
+    others = df.drop(index=1)
+    pdt.assert_frame_equal(result.drop(index=1), reference_engineer_features(others))
+    assert result.loc[0, ['gender', 'marital_status']].tolist() == ['female', '']
+
+
+def test_engineer_features_on_compact_frame():
+    result = engineer_features(compact_data())
+    expected = reference_engineer_features(raw_data())
+    # Same values; only the column dtypes of the compact frame differ
+    pdt.assert_frame_equal(result.astype(object), expected.astype(object), check_dtype=False)
+
+
+def test_apply_preprocessing_on_compact_frame():
+    preprocessor = joblib.load(PREPROCESSOR)
+    expected = apply_preprocessing(raw_data(), preprocessor)
+    pdt.assert_frame_equal(apply_preprocessing(compact_data(), preprocessor), expected)
+    pdt.assert_frame_equal(apply_preprocessing(compact_data(), preprocessor, copy=False), expected)
@@ -0,0 +1,94 @@
+import os
+import joblib
+import pandas as pd
+import pytest
+from scripts.compiled_preprocessing import compile_preprocessor
+from score_table import ScoreTable, build_score_table, update_score_table
+
+BACKEND = os.path.join(os.path.dirname(__file__), "..")
+RAW_DATA = os.path.join(BACKEND, "..", "raw_data1.csv")
+
+
+@pytest.fixture(scope="module")
+def model_and_plan():
+    model = joblib.load(os.path.join(BACKEND, "model2.pkl"))
+    plan = compile_preprocessor(joblib.load(os.path.join(BACKEND, "preprocessor.pkl")))
+    return model, plan
+
+
+@pytest.fixture(scope="module")
+def customers():
+    return pd.read_csv(RAW_DATA).iloc[:200]
+
+
+def edited(customers):
+    """
+        `customers` with the first one deleted, the second one changed and
+        a new one inserted.
+    """
+    data = customers.iloc[1:].copy()
+    data.loc[data.index[0], "duration"] += 12
+    inserted = customers.iloc[[5]].assign(Customer_ID="CUST-NEW")
+    return pd.concat([data, inserted], ignore_index=True)
+
+
+def as_dict(table):
+    return dict(table.scores.items())
+
+
+def test_delta_update_matches_full_rebuild(model_and_plan, customers):
+    model, plan = model_and_plan
+    table = build_score_table(customers, model, plan, "m1", "d1")
+    data = edited(customers)
+
+    updated, changes = update_score_table(table, data, model, plan, "m1", "d2")
+
+    assert changes == {"full": False, "scored": 2, "inserted": 1, "changed": 1, "deleted": 1}
+    rebuilt = build_score_table(data, model, plan, "m1", "d2")
+    assert as_dict(updated) == as_dict(rebuilt)
+    pd.testing.assert_series_equal(updated.fingerprints.sort_index(), rebuilt.fingerprints.sort_index())
+    assert customers["Customer_ID"].iloc[0] not in as_dict(updated)
+    assert updated.is_current("m1", "d2")
+
+
+def test_delta_update_from_saved_table(model_and_plan, customers, tmp_path):
+    # A memory-mapped table loaded from disk goes through the same delta
+    model, plan = model_and_plan
+    path = str(tmp_path / "score_table.arrow")
+    build_score_table(customers, model, plan, "m1", "d1").save(path)
+    data = edited(customers)
+
+    updated, changes = update_score_table(ScoreTable.load(path), data, model, plan, "m1", "d2")
+
+    assert not changes["full"] and changes["scored"] == 2
+    assert as_dict(updated) == as_dict(build_score_table(data, model, plan, "m1", "d2"))
+
+
+def test_unchanged_data_scores_nothing(model_and_plan, customers):
+    model, plan = model_and_plan
+    table = build_score_table(customers, model, plan, "m1", "d1")
+
+    updated, changes = update_score_table(table, customers, model, plan, "m1", "d1")
+
+    assert changes == {"full": False, "scored": 0, "inserted": 0, "changed": 0, "deleted": 0}
+    assert as_dict(updated) == as_dict(table)
+
+
+@pytest.mark.parametrize("previous", ["missing", "empty", "old_model", "no_fingerprints"])
+def test_full_rebuild(model_and_plan, customers, previous):
+    model, plan = model_and_plan
+    if previous == "missing":
+        table = None
+    elif previous == "empty":
+        table = build_score_table(customers.iloc[:0], model, plan, "m1", "d1")
+    elif previous == "old_model":
+        table = build_score_table(customers, model, plan, "m0", "d1")
+    else:
+        table = build_score_table(customers, model, plan, "m1", "d1")
+        table.fingerprints = None
+
+    updated, changes = update_score_table(table, customers, model, plan, "m1", "d2")
+
+    assert changes == {"full": True, "scored": customers["Customer_ID"].nunique()}
+    assert as_dict(updated) == as_dict(build_score_table(customers, model, plan, "m1", "d2"))
+    assert updated.model_version == "m1"
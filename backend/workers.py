@@ -0,0 +1,113 @@
+import asyncio
+import contextlib
+import glob
+import json
+import logging
+import os
+import time
+
+# Directory where each server process writes its status; set by
+# gunicorn.conf.py. Unset (single process), GET /workers reports only itself
+WORKER_STATUS_DIR = os.environ.get("WORKER_STATUS_DIR")
+# Seconds between status writes; a worker silent for 3 intervals is stale
+WORKER_HEARTBEAT_SECONDS = float(os.environ.get("WORKER_HEARTBEAT_SECONDS", 5))
+
+logger = logging.getLogger(__name__)
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class WorkerStatus:
+    """
+        Per-process health for multi-worker serving. Each worker rewrites
+        <status_dir>/<pid>.json from its event loop, so a worker whose loop
+        is blocked stops updating and shows up as stale in GET /workers,
+        whichever worker answers the request.
+    """
+
+    def __init__(self, status_fn, status_dir=WORKER_STATUS_DIR, interval=WORKER_HEARTBEAT_SECONDS):
+        # status_fn() -> dict with at least "ready"
+        self.status_fn = status_fn
+        self.status_dir = status_dir
+        self.interval = interval
+        self.pid = os.getpid()
+        self.started_at = time.time()
+        self._task = None
+        if status_dir:
+            os.makedirs(status_dir, exist_ok=True)
+
+    @property
+    def path(self):
+        return os.path.join(self.status_dir, f"{self.pid}.json")
+
+    def current(self):
+        try:
+            memory = round(rss_mb(), 1)
+        except OSError:
+            memory = None
+        return {**self.status_fn(), "pid": self.pid, "rss_mb": memory,
+                "started_at": self.started_at, "updated_at": time.time()}
+
+    def write(self):
+        with open(f"{self.path}.tmp", "w") as f:
+            json.dump(self.current(), f)
+        os.replace(f"{self.path}.tmp", self.path)
+
+    async def _beat(self):
+        while True:
+            try:
+                self.write()
+            except Exception:
+                logger.exception("Could not write worker status to %s", self.path)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        # Call from the event loop
+        if self.status_dir and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._beat())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.status_dir and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def workers(self):
+        """
+            Status of every worker on this host, each with a "healthy" flag:
+            alive, ready and heard from within 3 heartbeat intervals. Files
+            left by processes that no longer exist are removed.
+        """
+        if not self.status_dir:
+            return [{**self.current(), "stale": False, "healthy": bool(self.status_fn().get("ready"))}]
+
+        workers, now = [], time.time()
+        for path in sorted(glob.glob(os.path.join(self.status_dir, "*.json"))):
+            try:
+                with open(path) as f:
+                    status = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not pid_alive(status["pid"]):
+                # Another worker may be cleaning up the same file
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+                continue
+            status["stale"] = now - status["updated_at"] > 3 * self.interval
+            status["healthy"] = bool(status.get("ready")) and not status["stale"]
+            workers.append(status)
+        return workers
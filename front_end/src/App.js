@@ -18,8 +18,14 @@ function App() {
   const [error, setError] = useState('');
   const [result, setResult] = useState(null);
   const [activeTab, setActiveTab] = useState('file');
+
+  // Current page of file results (columnar JSON from /results/{id})
+  const [page, setPage] = useState(null);
+  const [pageLoading, setPageLoading] = useState(false);
  
-  const API_URL = 'http://localhost:8000/predict';
+  const API_BASE = 'http://localhost:8000';
+  const API_URL = `${API_BASE}/predict`;
+  const PAGE_SIZE = 10;
  
   const badgeColors = {
     Platinum: "primary",  // Blue
@@ -87,18 +93,21 @@ function App() {
     setLoading(true);
     setError('');
     setResult(null);
+    setPage(null);
  
     const formData = new FormData();
     formData.append('file', file);
  
     try {
-      const response = await axios.post(API_URL, formData, {
+      // Summary only; rows are fetched page by page from results_url
+      const response = await axios.post(`${API_URL}?response_format=summary`, formData, {
         headers: {
           'Content-Type': 'multipart/form-data'
         }
       });
      
       setResult(response.data);
+      await loadPage(response.data.results_url, 0);
     } catch (err) {
       console.error('Error:', err);
       setError(`Error: ${err.response?.data?.detail || err.message}`);
@@ -128,22 +137,37 @@ function App() {
     }
   };
  
+  const loadPage = async (resultsUrl, offset) => {
+    setPageLoading(true);
+    try {
+      const response = await axios.get(`${API_BASE}${resultsUrl}`, {
+        params: { offset, limit: PAGE_SIZE }
+      });
+      setPage(response.data);
+    } catch (err) {
+      console.error('Error:', err);
+      setError(`Error: ${err.response?.data?.detail || err.message}`);
+    } finally {
+      setPageLoading(false);
+    }
+  };
+
+  const pageRows = () => {
+    if (!page) return [];
+    return Array.from({ length: page.rows }, (_, rowIdx) =>
+      Object.fromEntries(page.columns.map(col => [col, page.data[col][rowIdx]]))
+    );
+  };
+
   const downloadCSV = () => {
-    if (!result || !result.predictions) return;
+    if (!result || !result.results_url) return;
    
-    const headers = Object.keys(result.predictions[0]).join(',');
-    const rows = result.predictions.map(row => Object.values(row).join(',')).join('\n');
-    const csvContent = `${headers}\n${rows}`;
-   
-    const blob = new Blob([csvContent], { type: 'text/csv' });
-    const url = URL.createObjectURL(blob);
     const a = document.createElement('a');
-    a.href = url;
+    a.href = `${API_BASE}${result.results_url}/download`;
     a.download = "Results.csv";
     document.body.appendChild(a);
     a.click();
     document.body.removeChild(a);
-    URL.revokeObjectURL(url);
   };
  
   return (
@@ -159,6 +183,7 @@ function App() {
               setActiveTab(k);
               setError('');
               setResult(null);
+              setPage(null);
             }}
             className="mb-4"
           >
@@ -265,7 +290,7 @@ function App() {
          
           {error && <Alert variant="danger">{error}</Alert>}
          
-          {result && activeTab === 'file' && result.predictions && (
+          {result && activeTab === 'file' && result.summary && (
             <>
               <Row className="mb-4">
                 <Col>
@@ -324,13 +349,13 @@ function App() {
                     <Table striped bordered hover size="sm">
                       <thead>
                         <tr>
-                          {Object.keys(result.predictions[0]).map((key, idx) => (
+                          {page && page.columns.map((key, idx) => (
                             <th key={idx}>{key}</th>
                           ))}
                         </tr>
                       </thead>
                       <tbody>
-                        {result.predictions.slice(0, 10).map((row, rowIdx) => (
+                        {pageRows().map((row, rowIdx) => (
                           <tr key={rowIdx}>
                             {Object.keys(row).map((key, colIdx) => (
                               <td key={colIdx}>
@@ -348,7 +373,29 @@ function App() {
                       </tbody>
                     </Table>
                   </div>
-                  <small className="text-muted">Showing first 10 rows only</small>
+                  {page && (
+                    <div className="d-flex justify-content-between align-items-center">
+                      <Button
+                        variant="outline-primary"
+                        size="sm"
+                        disabled={pageLoading || page.offset === 0}
+                        onClick={() => loadPage(result.results_url, Math.max(page.offset - PAGE_SIZE, 0))}
+                      >
+                        Previous
+                      </Button>
+                      <small className="text-muted">
+                        Rows {page.total === 0 ? 0 : page.offset + 1}-{page.offset + page.rows} of {page.total}
+                      </small>
+                      <Button
+                        variant="outline-primary"
+                        size="sm"
+                        disabled={pageLoading || page.offset + page.rows >= page.total}
+                        onClick={() => loadPage(result.results_url, page.offset + PAGE_SIZE)}
+                      >
+                        Next
+                      </Button>
+                    </div>
+                  )}
                 </Col>
               </Row>
              